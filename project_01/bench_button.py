@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+Button Benchmark
+--------------------------------------------------------------------------
+
+Compares Button.wait_for_press() polling the pin (edge_detect=False) with
+waiting for kernel edge events (edge_detect=True).
+
+Needs a jumper wire from an output pin to the button pin (the button may
+stay connected;  do not press it during the run).  The output pin plays
+the button:  HIGH is released, LOW is pressed (active low).  For each mode
+the benchmark measures
+
+  latency    time from driving the pin LOW to the on press callback
+  wakeups/s  how often wait_for_press() woke up while nothing happened
+  taps       how many of the short taps (shorter than sleep_time) were seen
+
+Usage:
+
+  python3 bench_button.py [-i BUTTON_PIN] [-o OUTPUT_PIN] [-n PRESSES]
+
+"""
+import argparse
+import random
+import threading
+import time
+
+import Adafruit_BBIO.GPIO as GPIO
+
+from button import Button
+
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+HOLD_TIME                   = 0.2      # Seconds a press is held
+TAP_TIME                    = 0.02     # Seconds a short tap is held
+GAP_TIME                    = 0.3      # Seconds between presses (+ up to
+                                       #   0.1 s, so presses do not line up
+                                       #   with the polling)
+IDLE_TIME                   = 5.0      # Seconds with the button untouched
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+
+def press(output, hold):
+    """Press the button for hold seconds; returns the time of the press"""
+    press_time = time.time()
+    GPIO.output(output, GPIO.LOW)
+    time.sleep(hold)
+    GPIO.output(output, GPIO.HIGH)
+    return press_time
+
+# End def
+
+
+def bench(pin, output, presses, edge_detect):
+    """Run one mode; returns (mean latency, max latency, wakeups/s, taps seen)"""
+    button = Button(pin, edge_detect=edge_detect)
+    seen   = []
+    button.set_on_press_callback(lambda: seen.append(time.time()))
+
+    # Waits for presses for the rest of the run (wait_for_press() cannot
+    # be interrupted, so the thread is left behind as a daemon)
+    def waiter():
+        while True:
+            button.wait_for_press()
+    # End def
+
+    thread = threading.Thread(target=waiter)
+    thread.daemon = True
+    thread.start()
+    time.sleep(GAP_TIME)
+
+    # Idle:  only wakeups
+    wakeups = button.get_wakeups()
+    time.sleep(IDLE_TIME)
+    wakeups_per_second = (button.get_wakeups() - wakeups) / IDLE_TIME
+
+    # Presses:  latency
+    latencies = []
+    for i in range(presses):
+        count      = len(seen)
+        press_time = press(output, HOLD_TIME)
+        time.sleep(GAP_TIME + random.uniform(0.0, 0.1))
+        if len(seen) > count:
+            latencies.append(seen[count] - press_time)
+
+    # Taps:  how many are noticed
+    count = len(seen)
+    for i in range(presses):
+        press(output, TAP_TIME)
+        time.sleep(GAP_TIME + random.uniform(0.0, 0.1))
+    taps = len(seen) - count
+
+    button.cleanup()
+
+    if not latencies:
+        return (0.0, 0.0, wakeups_per_second, taps)
+    return (sum(latencies) / len(latencies), max(latencies), wakeups_per_second, taps)
+
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main script
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark Button.wait_for_press()")
+    parser.add_argument("-i", "--pin", default="P2_2",
+                        help="button pin, default P2_2")
+    parser.add_argument("-o", "--output", default="P2_10",
+                        help="output pin wired to the button pin, default P2_10")
+    parser.add_argument("-n", "--presses", type=int, default=20,
+                        help="number of presses and of taps per mode, default 20")
+    args = parser.parse_args()
+
+    GPIO.setup(args.output, GPIO.OUT)
+    GPIO.output(args.output, GPIO.HIGH)
+
+    print("mode    latency ms (mean / max)  wakeups/s  taps seen")
+    for name, edge_detect in (("poll", False), ("edge", True)):
+        mean, worst, wakeups, taps = bench(args.pin, args.output, args.presses, edge_detect)
+        print("{0:6s} {1:12.1f} / {2:8.1f} {3:10.1f} {4:7d}/{5}".format(
+            name, 1000.0 * mean, 1000.0 * worst, wakeups, taps, args.presses))
+
+    GPIO.cleanup()
+
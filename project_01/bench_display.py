@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+HT16K33 Display Benchmark
+--------------------------------------------------------------------------
+
+Measures how many display updates per second the HT16K33 driver manages.
+
+  "spawn"  runs /usr/sbin/i2cset once per register write, which is what
+           the driver used to do (four processes per update())
+  "smbus"  calls HT16K33.update(), which writes over the open bus
+
+and how many bytes each frame puts on the bus for a few workloads, with
+one write per digit (as update() / text() used to do) and with the
+framebuffer, which only sends what changed.
+
+With -e the display is emulated (emulator.py), so the benchmark runs on
+any Linux box:  "spawn" is skipped, "emulated" measures the driver alone and
+the last frame is printed as ASCII art.
+
+Usage:
+
+  python3 bench_display.py [-n UPDATES] [-b BUS] [-a ADDRESS] [-e]
+
+"""
+import argparse
+import os
+import time
+
+from timer import HT16K33, DIGIT_ADDR, HEX_DIGITS, I2C_REGISTER_BYTES
+from emulator import EmulatedBus
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+
+def bench_spawn(bus, address, updates):
+    """Time update() the way the i2cset based driver did it"""
+    command = "/usr/sbin/i2cset -y {0} {1}".format(bus, address)
+    start = time.perf_counter()
+    for value in range(updates):
+        digits = [(value // 1000) % 10, (value // 100) % 10, (value // 10) % 10, value % 10]
+        for i in (3, 2, 1, 0):
+            os.system("{0} {1} {2}".format(command, DIGIT_ADDR[i], HEX_DIGITS[digits[i]]))
+    return time.perf_counter() - start
+
+# End def
+
+
+def bench_smbus(display, updates):
+    """Time update() over the open bus"""
+    start = time.perf_counter()
+    for value in range(updates):
+        display.update(value % 10000)
+    return time.perf_counter() - start
+
+# End def
+
+
+def countdown(display, seconds):
+    """Show a MM:SS countdown from seconds to 0"""
+    for t in range(seconds, -1, -1):
+        mins, secs = divmod(t, 60)
+        display.update((mins * 100) + secs)
+
+# End def
+
+
+def counter(display, updates):
+    """Count up from 0"""
+    for value in range(updates):
+        display.update(value % 10000)
+
+# End def
+
+
+def messages(display, updates):
+    """Alternate between two messages"""
+    for i in range(updates):
+        display.text("done" if i % 2 else "Go")
+
+# End def
+
+
+# Workload, function, bus bytes per frame with one write per digit
+#   update(): 4 digit writes; text(): blank() (5 writes) + 1 per character
+WORKLOADS = (
+    ("countdown", countdown, 4 * I2C_REGISTER_BYTES),
+    ("counter",   counter,   4 * I2C_REGISTER_BYTES),
+    ("messages",  messages,  8 * I2C_REGISTER_BYTES),
+)
+
+
+# ------------------------------------------------------------------------
+# Main script
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark HT16K33 display updates")
+    parser.add_argument("-n", "--updates", type=int, default=100,
+                        help="number of updates per mode, default 100")
+    parser.add_argument("-b", "--bus", type=int, default=1,
+                        help="i2c bus, default 1")
+    parser.add_argument("-a", "--address", type=lambda x: int(x, 0), default=0x70,
+                        help="i2c address, default 0x70")
+    parser.add_argument("-e", "--emulate", action="store_true",
+                        help="use an emulated display instead of the hardware")
+    args = parser.parse_args()
+
+    if args.emulate:
+        bus     = EmulatedBus((args.address,))
+        display = HT16K33(args.bus, args.address, i2c=bus)
+        modes   = (("emulated", bench_smbus(display, args.updates)),)
+    else:
+        display = HT16K33(args.bus, args.address)
+        modes   = (("spawn", bench_spawn(args.bus, args.address, args.updates)),
+                   ("smbus", bench_smbus(display, args.updates)))
+
+    print("mode     updates/s  ms/update")
+    for name, seconds in modes:
+        print("{0:8s} {1:9.1f} {2:10.2f}".format(name, args.updates / seconds,
+                                                 1000.0 * seconds / args.updates))
+
+    print()
+    print("workload   bytes/frame (per digit)  bytes/frame (framebuffer)")
+    for name, workload, per_digit in WORKLOADS:
+        display.clear()
+        before = display.get_bus_stats()
+        workload(display, args.updates)
+        after = display.get_bus_stats()
+        frames = after['frames'] - before['frames']
+        sent = after['bus_bytes'] - before['bus_bytes']
+        print("{0:10s} {1:23.1f} {2:26.1f}".format(name, per_digit,
+                                                   float(sent) / frames if frames else 0.0))
+
+    if args.emulate:
+        print()
+        print(bus.displays[args.address].render())
+        print("emulated bus: {0}".format(bus.get_stats()))
+
+    display.clear()
+    display.close()
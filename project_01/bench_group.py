@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+HT16K33 Display Group Benchmark
+--------------------------------------------------------------------------
+
+Measures frames per second and bus bytes per frame of a DisplayGroup with
+1 to N modules.  Each frame counts the timer down in the first module
+while the other modules show fields (BPM, SpO2, status) that rarely
+change, which is what a wide readout does most of the time.
+
+  "group"  DisplayGroup.show_time() + set_fields() + one flush()
+  "naive"  every module redraws its field and flushes on its own
+
+With -e the modules are emulated (emulator.py), so the benchmark runs on
+any Linux box.
+
+Usage:
+
+  python3 bench_group.py [-n FRAMES] [-m MODULES] [-b BUS] [-e]
+
+"""
+import argparse
+import time
+
+from display_group import DisplayGroup
+from emulator import EmulatedBus
+
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+FIRST_ADDRESS               = 0x70
+
+# Fields of the modules after the timer, e.g. BPM, SpO2 and a status;
+# they change every FIELD_PERIOD frames
+FIELDS                      = (72, 98, "good", "-", "-", "-", "-")
+FIELD_PERIOD                = 50
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+
+def field(module, frame):
+    """Return the field of a module (1 and up) for a frame"""
+    value = FIELDS[module - 1]
+    if isinstance(value, int):
+        return value + ((frame // FIELD_PERIOD) % 3)
+    return value
+
+# End def
+
+
+def bench_group(group, frames):
+    """Time frames drawn through the group"""
+    modules = len(group.displays)
+    start = time.perf_counter()
+    for frame in range(frames):
+        group.show_time(frame % 6000, 0)
+        group.set_fields([None] + [field(m, frame) for m in range(1, modules)])
+        group.flush()
+    return time.perf_counter() - start
+
+# End def
+
+
+def bench_naive(displays, frames):
+    """Time frames drawn one module at a time"""
+    start = time.perf_counter()
+    for frame in range(frames):
+        displays[0].show_time(frame % 6000)
+        displays[0].flush()
+        for m in range(1, len(displays)):
+            value = field(m, frame)
+            if isinstance(value, int):
+                displays[m].update(value)
+            else:
+                displays[m].text(value)
+            displays[m].flush()
+    return time.perf_counter() - start
+
+# End def
+
+
+# ------------------------------------------------------------------------
+# Main script
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark HT16K33 display groups")
+    parser.add_argument("-n", "--frames", type=int, default=1000,
+                        help="number of frames per run, default 1000")
+    parser.add_argument("-m", "--modules", type=int, default=4,
+                        help="largest number of modules, default 4 (at most 8)")
+    parser.add_argument("-b", "--bus", type=int, default=1,
+                        help="i2c bus, default 1")
+    parser.add_argument("-e", "--emulate", action="store_true",
+                        help="use emulated displays instead of the hardware")
+    args = parser.parse_args()
+
+    print("modules  mode   frames/s  bytes/frame")
+    for modules in range(1, min(args.modules, len(FIELDS) + 1) + 1):
+        addresses = tuple(range(FIRST_ADDRESS, FIRST_ADDRESS + modules))
+        for mode in ("group", "naive"):
+            i2c = EmulatedBus(addresses) if args.emulate else None
+            group = DisplayGroup(args.bus, addresses, auto_flush=False, i2c=i2c)
+            before = group.get_bus_stats()
+            if mode == "group":
+                seconds = bench_group(group, args.frames)
+            else:
+                seconds = bench_naive(group.displays, args.frames)
+            after = group.get_bus_stats()
+            print("{0:7d}  {1:5s} {2:9.1f} {3:12.1f}".format(
+                modules, mode, args.frames / seconds,
+                float(after['bus_bytes'] - before['bus_bytes']) / args.frames))
+            group.blank()
+            group.flush()
+            group.close()
+
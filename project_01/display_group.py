@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+HT16K33 Display Group
+--------------------------------------------------------------------------
+
+Several 4 digit HT16K33 modules on one i2c bus used as one wide display,
+e.g. timer, BPM, SpO2 and status side by side.
+
+All modules share one open bus.  The display functions below render into
+the framebuffers of the modules in one pass and remember which modules
+they touched; flush() then only looks at those modules and only writes
+the ones whose framebuffer actually changed, one module after the other
+while holding the group's bus lock.  A frame where one field changes
+costs the same with 1 or 8 modules.
+
+Software API:
+
+  DisplayGroup(bus, addresses=(0x70, 0x71), auto_flush=True, i2c=None)
+    - Provide i2c bus that the displays are on and their addresses, in
+      order from left to right
+    - i2c is an already open bus to use instead (see timer.HT16K33)
+    - With auto_flush=True every call below ends with a flush()
+
+    width
+      - Number of digits (4 per module)
+
+    text(value)
+      - Show text across all modules (left aligned, up to width
+        characters).  Modules whose digits did not change are skipped.
+
+    set_fields(fields)
+      - Show one field per module, left to right.  A field is an int
+        (update()), a str (text()), bytes (raw segments) or None to leave
+        the module as it is.  Fields equal to the last ones are skipped.
+
+    update(value, module=0), show_time(seconds, module=0),
+    set_colon(enable, module=0), blank(module=None)
+      - Same as the HT16K33 functions for one module (blank() without a
+        module blanks all of them)
+
+    setup(blink, brightness), set_blink(blink), set_brightness(brightness)
+      - Same as the HT16K33 functions for all modules
+
+    flush()
+      - Send the modules that changed.  Returns the number of bytes put on
+        the bus.
+
+    get_bus_stats()
+      - Return a dictionary with the number of flushes, module frames,
+        bus writes and bus bytes sent so far
+
+    close()
+      - Close the i2c bus
+
+"""
+import threading
+
+from font import render
+from timer import HT16K33, HT16K33_BLINK_OFF, HT16K33_BRIGHTNESS_HIGHEST
+
+try:
+    import smbus
+except ImportError:
+    # lets the module be imported (e.g. with the emulator) off-device
+    smbus = None
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+DIGITS_PER_MODULE           = 4
+
+# Field of a module that was last written by something else than set_fields()
+UNKNOWN_FIELD               = object()
+
+
+# ------------------------------------------------------------------------
+# Functions / Classes
+# ------------------------------------------------------------------------
+class DisplayGroup():
+    """ Class to manage several HT16K33 displays as one """
+    bus        = None
+    i2c        = None
+    displays   = None
+    width      = None
+    auto_flush = None
+
+    def __init__(self, bus, addresses=(0x70, 0x71), blink=HT16K33_BLINK_OFF,
+                 brightness=HT16K33_BRIGHTNESS_HIGHEST, auto_flush=True, i2c=None):
+        """ Open the bus once and set up every module """
+        if not addresses:
+            raise ValueError("Need at least one display address")
+
+        if i2c is None:
+            if smbus is None:
+                raise ImportError("The smbus module is required to talk to the HT16K33")
+            i2c = smbus.SMBus(bus)
+
+        self.bus        = bus
+        self.i2c        = i2c
+        self.auto_flush = auto_flush
+        self.lock       = threading.Lock()
+
+        # The modules only change their framebuffers; the group flushes
+        self.displays   = [HT16K33(bus, address, blink, brightness, auto_flush=False, i2c=i2c)
+                           for address in addresses]
+        self.width      = DIGITS_PER_MODULE * len(self.displays)
+
+        self._dirty     = set(range(len(self.displays)))
+        self._fields    = [UNKNOWN_FIELD] * len(self.displays)
+
+        # Statistics
+        self.flushes    = 0
+
+        self.flush()
+
+    # End def
+
+
+    def _touch(self, module):
+        """Mark a module as changed by a function other than set_fields()"""
+        self._fields[module] = UNKNOWN_FIELD
+        self._dirty.add(module)
+
+    # End def
+
+
+    def _changed(self):
+        """Flush the modules that changed if auto_flush is set"""
+        if self.auto_flush:
+            self.flush()
+
+    # End def
+
+
+    def text(self, value):
+        """Show text across all modules, left aligned.
+
+        Will throw a ValueError if the text is longer than the group or if
+        characters are used that are not supported.
+        """
+        if (len(value) > self.width):
+            raise ValueError("Must have at most {0} characters".format(self.width))
+
+        # One render for the whole group, then 4 digits per module
+        segments = render(value)
+        for i, display in enumerate(self.displays):
+            part = segments[i * DIGITS_PER_MODULE:(i + 1) * DIGITS_PER_MODULE]
+            if part != self._fields[i]:
+                display.set_segments(part)
+                self._fields[i] = part
+                self._dirty.add(i)
+        self._changed()
+
+    # End def
+
+
+    def set_fields(self, fields):
+        """Show one field per module, left to right.
+
+        :param fields: Sequence of int, str, bytes or None (unchanged),
+            at most one per module
+
+        Will throw a ValueError if there are more fields than modules or a
+        field cannot be shown.
+        """
+        if (len(fields) > len(self.displays)):
+            raise ValueError("Must have at most {0} fields".format(len(self.displays)))
+
+        for i, field in enumerate(fields):
+            if (field is None) or (field == self._fields[i]):
+                continue
+            display = self.displays[i]
+            if isinstance(field, bytes):
+                display.set_segments(field)
+            elif isinstance(field, str):
+                display.text(field)
+            elif isinstance(field, int):
+                display.update(field)
+            else:
+                raise ValueError("Field {0} must be an int, str or bytes".format(i))
+            self._fields[i] = field
+            self._dirty.add(i)
+        self._changed()
+
+    # End def
+
+
+    def update(self, value, module=0):
+        self.displays[module].update(value)
+        self._touch(module)
+        self._changed()
+
+    def show_time(self, seconds, module=0):
+        self.displays[module].show_time(seconds)
+        self._touch(module)
+        self._changed()
+
+    def set_colon(self, enable, module=0):
+        self.displays[module].set_colon(enable)
+        self._touch(module)
+        self._changed()
+
+    def blank(self, module=None):
+        modules = range(len(self.displays)) if module is None else (module,)
+        for i in modules:
+            self.displays[i].blank()
+            self._touch(i)
+        self._changed()
+
+    # End def
+
+
+    def setup(self, blink, brightness):
+        with self.lock:
+            for display in self.displays:
+                display.setup(blink, brightness)
+
+    def set_blink(self, blink):
+        with self.lock:
+            for display in self.displays:
+                display.set_blink(blink)
+
+    def set_brightness(self, brightness):
+        with self.lock:
+            for display in self.displays:
+                display.set_brightness(brightness)
+
+    # End def
+
+
+    def flush(self):
+        """Send the modules that changed in one session on the bus.
+
+        Returns the number of bytes put on the bus.
+        """
+        sent = 0
+        with self.lock:
+            dirty       = sorted(self._dirty)
+            self._dirty = set()
+            for i in dirty:
+                sent += self.displays[i].flush()
+            self.flushes += 1
+
+        return sent
+
+    # End def
+
+
+    def get_bus_stats(self):
+        """Return the bus statistics of all modules as a dictionary"""
+        stats = [display.get_bus_stats() for display in self.displays]
+        return {
+            'flushes'    : self.flushes,
+            'frames'     : sum(s['frames'] for s in stats),
+            'bus_writes' : sum(s['bus_writes'] for s in stats),
+            'bus_bytes'  : sum(s['bus_bytes'] for s in stats),
+        }
+
+    # End def
+
+
+    def close(self):
+        """Close the i2c bus (shared by all modules)"""
+        self.i2c.close()
+
+    # End def
+
+# End class
+
+
+# ------------------------------------------------------------------------
+# Main script
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import time
+
+    print("Test Display Group:")
+
+    group = DisplayGroup(1, (0x70, 0x71, 0x72, 0x73))
+
+    group.text("Hello")
+    time.sleep(2)
+
+    for t in range(90, 0, -1):
+        group.show_time(t, 0)
+        group.set_fields([None, 72, 98, "good"])
+        time.sleep(0.1)
+
+    group.blank()
+    print(group.get_bus_stats())
+    print("Test Finished.")
+
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+HT16K33 Background Writer
+--------------------------------------------------------------------------
+
+Non-blocking front end for an HT16K33 display.
+
+A writer thread owns the bus.  The display functions below only change
+the display's framebuffer (an in-memory copy of the display RAM) and
+return; the writer thread then sends the newest framebuffer.  Any state
+that was replaced before the writer got to it is never written (latest
+value wins), so a slow bus never holds up the caller.  A frame or setting
+lost to a bus error is retried, waiting longer after each failed attempt.
+
+Software API:
+
+  DisplayWriter(display, min_interval=0.0)
+    - Provide the HT16K33 to write to.  The writer turns off its
+      auto_flush and must be the only user of the display from now on.
+    - min_interval is the shortest time between two frames in seconds
+
+    update(value), show_time(seconds), text(value),
+    set_segments(segments, colon=False), set_colon(enable), blank(), clear()
+      - Same as the HT16K33 functions, but never wait for the bus
+
+    setup(blink, brightness), set_blink(blink), set_brightness(brightness)
+      - Same as the HT16K33 functions, sent by the writer thread.  A
+        setting equal to the last one requested does not even wake it.
+
+    alert(value, blink=HT16K33_BLINK_1HZ), pulse(low=0, high=15, period=2.0,
+    rate=4.0, cycles=None)
+      - Same as the HT16K33 effects; the blinking or the brightness steps
+        go through the writer thread
+
+    get_stats()
+      - Return a dictionary with the number of posted updates, frames
+        written, updates coalesced into later ones, bus errors, frames per
+        second and the bus writes (in total and per minute)
+
+    close()
+      - Write what is still pending and stop the writer thread
+
+"""
+import threading
+import time
+
+from timer import (Pulse, HT16K33_BLINK_DISPLAYON, HT16K33_BLINK_OFF, HT16K33_BLINK_2HZ,
+                   HT16K33_BLINK_1HZ, HT16K33_BLINK_HALFHZ, HT16K33_BRIGHTNESS_DARKEST,
+                   HT16K33_BRIGHTNESS_HIGHEST, PULSE_PERIOD, PULSE_RATE)
+
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+# Wait before retrying after a bus error (seconds); doubles with every
+# failed attempt up to RETRY_DELAY_MAX
+RETRY_DELAY                 = 0.05
+RETRY_DELAY_MAX             = 2.0
+
+
+# ------------------------------------------------------------------------
+# Functions / Classes
+# ------------------------------------------------------------------------
+class DisplayWriter():
+    """ Writes to an HT16K33 from a background thread """
+    display      = None
+    min_interval = None
+
+    def __init__(self, display, min_interval=0.0):
+        """ Take over the display and start the writer thread """
+        self.display      = display
+        self.min_interval = min_interval
+        display.auto_flush = False
+
+        self._lock    = threading.Condition()
+        self._pending = 0        # updates since the last frame was taken
+        self._settings  = {}     # newest settings not yet sent
+        self._requested = {}     # last value requested for each setting
+        self._retry   = False    # the last frame was lost to a bus error
+        self._closed  = False
+
+        # Statistics
+        self.posted    = 0
+        self.frames    = 0
+        self.coalesced = 0
+        self.errors    = 0
+        self.started   = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    # End def
+
+
+    def _post(self, function, *args):
+        """Apply a display function to the framebuffer and wake the writer"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DisplayWriter is closed")
+            function(*args)
+            self._pending += 1
+            self.posted   += 1
+            self._lock.notify()
+
+    # End def
+
+
+    def update(self, value):
+        self._post(self.display.update, value)
+
+    def show_time(self, seconds):
+        self._post(self.display.show_time, seconds)
+
+    def text(self, value):
+        self._post(self.display.text, value)
+
+    def set_segments(self, segments, colon=False):
+        self._post(self.display.set_segments, segments, colon)
+
+    def set_colon(self, enable):
+        self._post(self.display.set_colon, enable)
+
+    def blank(self):
+        self._post(self.display.blank)
+
+    def clear(self):
+        self._post(self.display.clear)
+
+    # End def
+
+
+    def _post_setting(self, name, value):
+        """Queue a setting; only the newest value of each is sent"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DisplayWriter is closed")
+            if self._requested.get(name) == value:
+                return
+            if name in self._settings:
+                self.coalesced += 1
+            self._requested[name] = value
+            self._settings[name]  = value
+            self.posted += 1
+            self._lock.notify()
+
+    # End def
+
+
+    def setup(self, blink, brightness):
+        self.set_blink(blink)
+        self.set_brightness(brightness)
+
+    def set_blink(self, blink):
+        # Check here, the writer thread has no one to raise the error to
+        if ((blink & ~HT16K33_BLINK_DISPLAYON) not in
+            (HT16K33_BLINK_OFF, HT16K33_BLINK_2HZ, HT16K33_BLINK_1HZ, HT16K33_BLINK_HALFHZ)):
+            raise ValueError("Blink must be one of the HT16K33_BLINK_* values")
+        self._post_setting('blink', blink)
+
+    def set_brightness(self, brightness):
+        # Check here, the writer thread has no one to raise the error to
+        if ((brightness < HT16K33_BRIGHTNESS_DARKEST) or (brightness > HT16K33_BRIGHTNESS_HIGHEST)):
+            raise ValueError("Brightness is not between 0 and 15")
+        self._post_setting('brightness', brightness)
+
+    @property
+    def brightness(self):
+        """Last brightness requested, else the display's brightness"""
+        return self._requested.get('brightness', self.display.brightness)
+
+    # End def
+
+
+    def alert(self, value, blink=HT16K33_BLINK_1HZ):
+        self.text(value)
+        self.set_blink(blink)
+
+    def pulse(self, low=HT16K33_BRIGHTNESS_DARKEST, high=HT16K33_BRIGHTNESS_HIGHEST,
+              period=PULSE_PERIOD, rate=PULSE_RATE, cycles=None):
+        pulse = Pulse(self, low, high, period, rate, cycles)
+        pulse.start()
+        return pulse
+
+    # End def
+
+
+    def _run(self):
+        """Writer thread: send the newest framebuffer whenever it changed"""
+        retry_delay = RETRY_DELAY
+        while True:
+            with self._lock:
+                while not (self._pending or self._settings or self._retry or self._closed):
+                    self._lock.wait()
+                if not (self._pending or self._settings or self._retry):
+                    break
+
+                # Updates that arrived together are written as one frame
+                if self._pending > 1:
+                    self.coalesced += self._pending - 1
+                frame = bytes(self.display.ram) if (self._pending or self._retry) else None
+                settings = self._settings
+                self._pending  = 0
+                self._settings = {}
+                self._retry    = False
+            started = time.monotonic()
+
+            # The display skips settings it already has.  A bus error (e.g.
+            # a loose wire) must not stop the writer or lose the frame (e.g.
+            # a one-off alert("done")):  count it, keep the frame and the
+            # settings due and try again after a growing delay
+            try:
+                if 'blink' in settings:
+                    self.display.set_blink(settings['blink'])
+                if 'brightness' in settings:
+                    self.display.set_brightness(settings['brightness'])
+                if frame is not None:
+                    self.display.flush(frame)
+                    self.frames += 1
+                retry_delay = RETRY_DELAY
+            except OSError:
+                self.errors += 1
+                self.display.shown = None
+                with self._lock:
+                    if self._closed:
+                        # nobody waits for it any more
+                        break
+                    self._retry = True
+                    # settings requested since then are newer
+                    for name, value in settings.items():
+                        self._settings.setdefault(name, value)
+                time.sleep(retry_delay)
+                retry_delay = min(2 * retry_delay, RETRY_DELAY_MAX)
+
+            # Leave time for more updates to coalesce into the next frame
+            if self.min_interval > 0:
+                delay = started + self.min_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    # End def
+
+
+    def get_stats(self):
+        """Return the writer statistics as a dictionary"""
+        elapsed = time.monotonic() - self.started
+        bus     = self.display.get_bus_stats()
+        return {
+            'posted'             : self.posted,
+            'frames'             : self.frames,
+            'coalesced'          : self.coalesced,
+            'errors'             : self.errors,
+            'fps'                : (self.frames / elapsed) if elapsed > 0 else 0.0,
+            'bus_writes'         : bus['bus_writes'],
+            'bus_writes_per_min' : (60.0 * bus['bus_writes'] / elapsed) if elapsed > 0 else 0.0,
+        }
+
+    # End def
+
+
+    def close(self, timeout=2.0):
+        """Write what is still pending and stop the writer thread"""
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        self._thread.join(timeout)
+
+    # End def
+
+# End class
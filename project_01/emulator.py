@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+HT16K33 Emulator
+--------------------------------------------------------------------------
+
+In-memory stand-in for the i2c bus and the HT16K33 displays on it, so the
+display code can be run, checked and benchmarked without a PocketBeagle.
+
+Writes are decoded the way the HT16K33 does it: a byte below 0x10 is a
+display RAM address, 0x2X is system setup (oscillator), 0x8X is display
+setup (on / blink) and 0xEX is brightness.  Data written to the RAM
+auto-increments the address and wraps around at 16 bytes.
+
+Software API:
+
+  EmulatedBus(addresses=(0x70,))
+    - Drop-in replacement for smbus.SMBus with an HT16K33 at each address.
+      Pass it as HT16K33(1, address, i2c=EmulatedBus()).
+    - Writes to any other address raise an OSError, like a real bus
+      when nothing acknowledges.
+
+    write_byte(address, value), write_byte_data(address, register, value),
+    write_i2c_block_data(address, register, data), close()
+      - Same as smbus.SMBus
+
+    displays
+      - Dictionary of address -> EmulatedHT16K33
+
+    get_stats()
+      - Return a dictionary with the number of writes and bytes that went
+        over the bus (counted like HT16K33.get_bus_stats())
+
+  EmulatedHT16K33()
+    - The state of one display:  ram (16 bytes), oscillator, display_on,
+      blink and brightness
+
+    render()
+      - Return the frame as ASCII seven-segment art (3 lines), followed
+        by a line with the display state
+
+    read_text()
+      - Return the characters shown, e.g. "12:34" or "done"; "?" for
+        segment patterns that are not in the font
+
+"""
+import errno
+
+from font import LETTERS
+
+# The display layout, the bus byte counts and the commands shared with the
+# driver come from timer.py, so the two cannot drift apart
+from timer import (HT16K33_RAM_SIZE, I2C_COMMAND_BYTES, I2C_REGISTER_BYTES,
+                   DIGIT_ADDR, COLON_ADDR, COLON_VALUE,
+                   HT16K33_SYSTEM_SETUP, HT16K33_OSCILLATOR,
+                   HT16K33_BLINK_CMD as HT16K33_DISPLAY_SETUP,
+                   HT16K33_BLINK_DISPLAYON as HT16K33_DISPLAYON,
+                   HT16K33_BRIGHTNESS_CMD as HT16K33_BRIGHTNESS)
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+HT16K33_ADDRESS_MASK        = 0xF0
+HT16K33_DATA_MASK           = 0x0F
+HT16K33_RAM_ADDRESS         = 0x00
+HT16K33_BLINK_MASK          = 0x06
+
+SEGMENT_A                   = 0x01
+SEGMENT_B                   = 0x02
+SEGMENT_C                   = 0x04
+SEGMENT_D                   = 0x08
+SEGMENT_E                   = 0x10
+SEGMENT_F                   = 0x20
+SEGMENT_G                   = 0x40
+SEGMENT_DP                  = 0x80
+
+BLINK_NAMES                 = {0x00 : "off", 0x02 : "2Hz", 0x04 : "1Hz", 0x06 : "0.5Hz"}
+
+# Segment pattern -> character; lower case wins over upper case and digits
+# win over the letters that look the same (e.g. "0" and "O", "5" and "S")
+CHARACTERS                  = {value : key for key, value in sorted(LETTERS.items())}
+CHARACTERS.update({LETTERS[digit] : digit for digit in "0123456789"})
+
+
+# ------------------------------------------------------------------------
+# Functions / Classes
+# ------------------------------------------------------------------------
+
+def render_digit(segments):
+    """Return the 3 lines of ASCII art for one digit"""
+    return (" " + ("_" if segments & SEGMENT_A else " ") + "  ",
+            ("|" if segments & SEGMENT_F else " ") +
+            ("_" if segments & SEGMENT_G else " ") +
+            ("|" if segments & SEGMENT_B else " ") + " ",
+            ("|" if segments & SEGMENT_E else " ") +
+            ("_" if segments & SEGMENT_D else " ") +
+            ("|" if segments & SEGMENT_C else " ") +
+            ("." if segments & SEGMENT_DP else " "))
+
+# End def
+
+
+class EmulatedHT16K33():
+    """ State of one emulated HT16K33 """
+    ram        = None
+    oscillator = None
+    display_on = None
+    blink      = None
+    brightness = None
+
+    def __init__(self):
+        """ Power up state:  oscillator off, display off, RAM cleared """
+        self.ram        = bytearray(HT16K33_RAM_SIZE)
+        self.pointer    = 0
+        self.oscillator = False
+        self.display_on = False
+        self.blink      = 0
+        self.brightness = 0
+
+    # End def
+
+
+    def command(self, command):
+        """Decode one command byte"""
+        kind = command & HT16K33_ADDRESS_MASK
+        data = command & HT16K33_DATA_MASK
+
+        if kind == HT16K33_RAM_ADDRESS:
+            self.pointer    = data
+        elif kind == HT16K33_SYSTEM_SETUP:
+            self.oscillator = bool(data & HT16K33_OSCILLATOR)
+        elif kind == HT16K33_DISPLAY_SETUP:
+            self.display_on = bool(data & HT16K33_DISPLAYON)
+            self.blink      = data & HT16K33_BLINK_MASK
+        elif kind == HT16K33_BRIGHTNESS:
+            self.brightness = data
+        else:
+            raise ValueError("Command 0x{0:02X} not supported".format(command))
+
+    # End def
+
+
+    def write(self, command, data):
+        """Decode a command followed by data bytes"""
+        self.command(command)
+        if (command & HT16K33_ADDRESS_MASK) != HT16K33_RAM_ADDRESS:
+            # Data after a command is ignored by the HT16K33
+            return
+        for value in data:
+            self.ram[self.pointer] = value & 0xFF
+            self.pointer = (self.pointer + 1) % HT16K33_RAM_SIZE
+
+    # End def
+
+
+    def is_lit(self):
+        """Return True if the display shows something (ignoring blink)"""
+        return self.oscillator and self.display_on
+
+    # End def
+
+
+    def render(self):
+        """Return the frame as ASCII seven-segment art"""
+        lines = ["", "", ""]
+        for i, address in enumerate(DIGIT_ADDR):
+            segments = self.ram[address] if self.is_lit() else 0x00
+            for line, part in enumerate(render_digit(segments)):
+                lines[line] += part
+            if i == 1:
+                colon = self.is_lit() and (self.ram[COLON_ADDR] & COLON_VALUE)
+                lines[0] += " "
+                lines[1] += "." if colon else " "
+                lines[2] += "." if colon else " "
+
+        if not self.oscillator:
+            state = "oscillator off"
+        elif not self.display_on:
+            state = "display off"
+        else:
+            state = "brightness {0}, blink {1}".format(self.brightness, BLINK_NAMES[self.blink])
+        lines.append("[{0}]".format(state))
+
+        return "\n".join(lines)
+
+    # End def
+
+
+    def read_text(self):
+        """Return the characters shown on the display"""
+        if not self.is_lit():
+            return ""
+
+        chars = []
+        for i, address in enumerate(DIGIT_ADDR):
+            segments = self.ram[address]
+            chars.append(CHARACTERS.get(segments & ~SEGMENT_DP, "?"))
+            if segments & SEGMENT_DP:
+                chars.append(".")
+            if (i == 1) and (self.ram[COLON_ADDR] & COLON_VALUE):
+                chars.append(":")
+
+        return "".join(chars).strip()
+
+    # End def
+
+# End class
+
+
+class EmulatedBus():
+    """ smbus.SMBus replacement with emulated HT16K33 displays """
+    displays = None
+
+    def __init__(self, addresses=(0x70,)):
+        """ Put an emulated display at each address """
+        self.displays = {address : EmulatedHT16K33() for address in addresses}
+
+        # Bus statistics
+        self.writes = 0
+        self.bytes  = 0
+
+    # End def
+
+
+    def _device(self, address):
+        """Return the display at address, as the bus would address it"""
+        try:
+            return self.displays[address]
+        except KeyError:
+            raise OSError(errno.EREMOTEIO, "No device at address 0x{0:02X}".format(address))
+
+    # End def
+
+
+    def write_byte(self, address, value):
+        self._device(address).write(value, ())
+        self.writes += 1
+        self.bytes  += I2C_COMMAND_BYTES
+
+    def write_byte_data(self, address, register, value):
+        self._device(address).write(register, (value,))
+        self.writes += 1
+        self.bytes  += I2C_REGISTER_BYTES
+
+    def write_i2c_block_data(self, address, register, data):
+        self._device(address).write(register, data)
+        self.writes += 1
+        self.bytes  += I2C_COMMAND_BYTES + len(data)
+
+    def close(self):
+        pass
+
+    # End def
+
+
+    def get_stats(self):
+        """Return the bus statistics as a dictionary"""
+        return {
+            'writes' : self.writes,
+            'bytes'  : self.bytes,
+        }
+
+    # End def
+
+# End class
+
+
+# ------------------------------------------------------------------------
+# Main script
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    from timer import HT16K33
+
+    print("Test Emulator:")
+
+    bus     = EmulatedBus()
+    display = HT16K33(1, 0x70, i2c=bus)
+    screen  = bus.displays[0x70]
+
+    for seconds in (125, 60, 1):
+        display.show_time(seconds)
+        print(screen.render())
+        print(repr(screen.read_text()))
+
+    display.text("done")
+    print(screen.render())
+    print(repr(screen.read_text()))
+
+    print(bus.get_stats())
+    print("Test Finished.")
+
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+--------------------------------------------------------------------------
+Seven-Segment Font
+--------------------------------------------------------------------------
+
+Font shared by the HT16K33 driver (timer.py) and the apps that use it.
+
+Software API:
+
+  render(text)
+    - Return the segment bytes for text, one byte per character.  Text is
+      translated in one bytes.translate() call and the result is cached.
+    - Throws a ValueError for characters that are not supported.
+
+  marquee_frames(text, width=4)
+    - Return a tuple of width-byte frames that scroll text in from the
+      right and out to the left.  The frames are cached, so playing a
+      message again costs nothing.
+
+--------------------------------------------------------------------------
+Background Information:
+
+  * See https://en.wikipedia.org/wiki/Seven-segment_display for reference
+  * Letters Supported from:
+      * https://en.wikichip.org/wiki/seven-segment_display/representing_letters
+
+"""
+from functools import lru_cache
+
+# ------------------------------------------------------------------------
+# Constants
+# ------------------------------------------------------------------------
+
+HEX_DIGITS                  = [0x3f, 0x06, 0x5b, 0x4f,     # 0, 1, 2, 3
+                               0x66, 0x6d, 0x7d, 0x07,     # 4, 5, 6, 7
+                               0x7f, 0x6f, 0x77, 0x7c,     # 8, 9, A, b
+                               0x39, 0x5e, 0x79, 0x71]     # C, d, E, F
+
+LETTERS                     = { "a" : 0x77, "A" : 0x77,    # "A"
+                                "b" : 0x7c, "B" : 0x7c,    # "b"
+                                "c" : 0x58, "C" : 0x39,    # "c", "C"
+                                "d" : 0x5e, "D" : 0x5e,    # "d"
+                                "e" : 0x79, "E" : 0x79,    # "E"
+                                "f" : 0x71, "F" : 0x71,    # "F"
+                                "g" : 0x6F, "G" : 0x6F,    # "g"
+                                "h" : 0x74, "H" : 0x76,    # "h", "H"
+                                "i" : 0x04, "I" : 0x30,    # "i", "I"
+                                "j" : 0x0e, "J" : 0x0e,    # "J"
+# Cannot be implemented         "k" : None, "K" : None,
+                                "l" : 0x38, "L" : 0x38,    # "L"
+# Cannot be implemented         "m" : None, "M" : None,
+                                "n" : 0x54, "N" : 0x54,    # "n"
+                                "o" : 0x5c, "O" : 0x3f,    # "o", "O"
+                                "p" : 0x73, "P" : 0x73,    # "P"
+                                "q" : 0x67, "Q" : 0x67,    # "q"
+                                "r" : 0x50, "R" : 0x50,    # "r"
+                                "s" : 0x6D, "S" : 0x6D,    # "S"
+                                "t" : 0x78, "T" : 0x78,    # "t"
+                                "u" : 0x1c, "U" : 0x3e,    # "u", "U"
+# Cannot be implemented         "v" : None, "V" : None,
+# Cannot be implemented         "w" : None, "W" : None,
+# Cannot be implemented         "x" : None, "X" : None,
+                                "y" : 0x6e, "Y" : 0x6e,    # "y"
+# Cannot be implemented         "z" : None, "Z" : None,
+                                " " : 0x00,                # " "
+                                "-" : 0x40,                # "-"
+                                "0" : 0x3f,                # "0"
+                                "1" : 0x06,                # "1"
+                                "2" : 0x5b,                # "2"
+                                "3" : 0x4f,                # "3"
+                                "4" : 0x66,                # "4"
+                                "5" : 0x6d,                # "5"
+                                "6" : 0x7d,                # "6"
+                                "7" : 0x07,                # "7"
+                                "8" : 0x7f,                # "8"
+                                "9" : 0x6f,                # "9"
+                                "?" : 0x53                 # "?"
+                              }
+
+# Marks characters without a segment pattern in SEGMENT_TABLE (no valid
+# pattern has the decimal point and all segments lit)
+UNSUPPORTED                 = 0xFF
+
+# bytes.translate() table:  character code -> segment byte
+SEGMENT_TABLE               = bytes(LETTERS.get(chr(code), UNSUPPORTED) for code in range(256))
+
+BLANK                       = 0x00
+
+# Number of rendered strings / marquees kept
+RENDER_CACHE_SIZE           = 128
+MARQUEE_CACHE_SIZE          = 16
+
+
+# ------------------------------------------------------------------------
+# Functions
+# ------------------------------------------------------------------------
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render(text):
+    """Return the segment bytes for text, one byte per character.
+
+    Will throw a ValueError if a character is not supported.
+    """
+    try:
+        segments = text.encode("latin-1").translate(SEGMENT_TABLE)
+    except UnicodeEncodeError as error:
+        raise ValueError("Character {0} not supported".format(text[error.start]))
+
+    bad = segments.find(UNSUPPORTED)
+    if bad >= 0:
+        raise ValueError("Character {0} not supported".format(text[bad]))
+
+    return segments
+
+# End def
+
+
+@lru_cache(maxsize=MARQUEE_CACHE_SIZE)
+def marquee_frames(text, width=4):
+    """Return the frames that scroll text across a width-digit display.
+
+    The text enters from the right on a blank display and leaves to the
+    left until the display is blank again.
+
+    Will throw a ValueError if a character is not supported.
+    """
+    padding = bytes([BLANK]) * width
+    strip   = padding + render(text) + padding
+
+    return tuple(strip[i:i + width] for i in range(len(strip) - width + 1))
+
+# End def
@@ -0,0 +1,50 @@
+# -*-coding:utf-8
+"""
+Compare the share of calculation windows that give a valid reading with
+fixed LED currents and with LED current control, by replaying recordings
+at virtual time. The replay scales the recorded signal with the LED
+current (see ReplaySensor).
+
+  python bench_agc.py [recording.ppg ...]
+
+Without recordings, synthetic signals at a range of levels are used,
+from too weak for the finger check to clipping the ADC.
+"""
+
+from replay import replay
+from synthetic import write_synthetic_recording
+from subscription import QUALITY_NO_FINGER
+import argparse
+import os
+import tempfile
+
+SCALES = (0.3, 0.6, 1.0, 2.0, 2.8)
+
+
+def valid_yield(result):
+    windows = result['pipeline']['windows']
+    valid = sum(1 for reading in result['readings'] if reading.quality != QUALITY_NO_FINGER)
+    return float(valid) / windows if windows else 0.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark LED current control")
+    parser.add_argument("files", nargs="*",
+                        help="recordings written with main.py -o, default synthetic")
+    args = parser.parse_args()
+
+    paths = args.files
+    if not paths:
+        directory = tempfile.mkdtemp()
+        for scale in SCALES:
+            path = os.path.join(directory, 'synthetic-x{0}.ppg'.format(scale))
+            paths.append(write_synthetic_recording(path, 120, noise=200, scale=scale))
+
+    print("recording              fixed  controlled  adjustments  red_pa  ir_pa")
+    for path in paths:
+        fixed = replay(path)
+        controlled = replay(path, led_control=True)
+        pipeline = controlled['pipeline']
+        print("{0:20s} {1:6.0%} {2:11.0%} {3:12d} {4:#7x} {5:#6x}".format(
+            os.path.basename(path)[-20:], valid_yield(fixed), valid_yield(controlled),
+            pipeline['led_adjustments'], pipeline['red_pa'], pipeline['ir_pa']))
@@ -0,0 +1,45 @@
+# -*-coding:utf-8
+"""
+Compare I2C traffic and CPU time with and without the proximity based
+idle mode, by replaying a recording at virtual time.
+
+  python bench_idle.py [recording.ppg]
+
+Without a recording a synthetic session is used in which the finger is
+only on the sensor for one minute out of five.
+"""
+
+from replay import replay
+from synthetic import write_synthetic_recording
+import argparse
+import os
+import tempfile
+import time
+
+
+def finger_on(t):
+    return 30 <= t < 60 or 210 <= t < 240
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the proximity idle mode")
+    parser.add_argument("file", nargs="?", default=None,
+                        help="recording written with main.py -o, default synthetic")
+    args = parser.parse_args()
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.ppg')
+        write_synthetic_recording(path, 300, noise=200, finger=finger_on)
+
+    print("mode     i2c/s  wakeups/s  cpu (ms/min)  idle (s)  readings")
+    for name, idle in (("always", False), ("idle", True)):
+        start = time.process_time()
+        result = replay(path, adaptive_poll=True, idle_detect=idle)
+        cpu = time.process_time() - start
+        pipeline = result['pipeline']
+        seconds = result['recorded_seconds']
+        print("{0:7s} {1:6.1f} {2:10.1f} {3:13.1f} {4:9.1f} {5:9d}".format(
+            name, result['transactions'] / seconds, pipeline['wakeups'] / seconds,
+            1000.0 * cpu * 60 / seconds, pipeline['idle_seconds'],
+            len(result['readings'])))
@@ -0,0 +1,37 @@
+# -*-coding:utf-8
+"""
+Compare acquisition wakeups per second with the fixed LOOP_TIME poll and
+with the adaptive poller, by replaying a recording at virtual time.
+
+  python bench_polling.py [recording.ppg]
+
+Without a recording two minutes of synthetic signal are used.
+"""
+
+from replay import replay
+from synthetic import write_synthetic_recording
+import argparse
+import os
+import tempfile
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark fixed versus adaptive FIFO polling")
+    parser.add_argument("file", nargs="?", default=None,
+                        help="recording written with main.py -o, default synthetic")
+    args = parser.parse_args()
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.ppg')
+        write_synthetic_recording(path, 120, noise=200)
+
+    print("mode      wakeups/s  samples/wakeup  drains  overflows  readings")
+    for name, adaptive in (("fixed", False), ("adaptive", True)):
+        result = replay(path, adaptive_poll=adaptive)
+        pipeline = result['pipeline']
+        seconds = result['recorded_seconds']
+        print("{0:8s} {1:10.1f} {2:15.2f} {3:7d} {4:10d} {5:9d}".format(
+            name, pipeline['wakeups'] / seconds,
+            float(pipeline['samples_read']) / pipeline['wakeups'],
+            pipeline['drains'], result['overflows'], len(result['readings'])))
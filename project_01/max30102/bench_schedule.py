@@ -0,0 +1,46 @@
+# -*-coding:utf-8
+"""
+Measure the CPU cost and update latency of HeartRateMonitor's calculation
+schedule (window size / hop) by replaying a recording as fast as possible.
+
+  python bench_schedule.py [recording.ppg]
+
+Without a recording two minutes of synthetic signal are used.
+"""
+
+from replay import replay
+from synthetic import write_synthetic_recording
+import argparse
+import os
+import tempfile
+
+WINDOWS = [100, 150]
+HOPS = [1, 5, 12, 25, 50]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark HeartRateMonitor window / hop settings")
+    parser.add_argument("file", nargs="?", default=None,
+                        help="recording written with main.py -o, default synthetic")
+    args = parser.parse_args()
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.ppg')
+        write_synthetic_recording(path, 120, noise=200)
+
+    print("window  hop  windows  CPU ms/s  CPU %   update every (s)  worst latency (s)")
+    for window in WINDOWS:
+        for hop in HOPS:
+            result = replay(path, window_size=window, hop_samples=hop)
+            pipeline = result['pipeline']
+            seconds = result['recorded_seconds']
+            windows = pipeline['windows']
+            cpu = pipeline['compute_seconds']
+            per_window = cpu / windows if windows else 0.0
+            interval = seconds / windows if windows else 0.0
+            # a change in the signal shows up at most one hop plus one
+            # calculation later
+            print("{0:6d} {1:4d} {2:8d} {3:9.2f} {4:6.2f}   {5:16.2f}  {6:17.3f}".format(
+                window, hop, windows, 1000.0 * cpu / seconds, 100.0 * cpu / seconds,
+                interval, interval + per_window))
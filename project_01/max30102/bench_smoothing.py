@@ -0,0 +1,74 @@
+# -*-coding:utf-8
+"""
+Compare BPM smoothing settings on a synthetic series of per-window BPM
+values: a step from 65 to 95 BPM with some jitter and occasional
+spurious values, as produced by a missed or extra peak.
+
+  python bench_smoothing.py
+
+For every setting it reports how many windows after the step the value
+settles within SETTLE_BPM of the new rate (on the same series without
+spurious values), the RMS error while the rate is steady, the largest
+error caused by a spurious value and the cost of one update.
+"""
+
+from smoothing import BpmSmoother, SMOOTH_MEAN, SMOOTH_MEDIAN, SMOOTH_EMA
+import timeit
+
+import numpy as np
+
+STEP_AT = 120
+SETTLE_BPM = 3
+SETTINGS = (
+    ("mean 4", dict(method=SMOOTH_MEAN, horizon=4)),
+    ("mean 8", dict(method=SMOOTH_MEAN, horizon=8)),
+    ("median 5", dict(method=SMOOTH_MEDIAN, horizon=5)),
+    ("ema 4", dict(method=SMOOTH_EMA, horizon=4)),
+    ("mean 4 + hampel", dict(method=SMOOTH_MEAN, horizon=4, outlier_threshold=3)),
+    ("ema 4 + hampel", dict(method=SMOOTH_EMA, horizon=4, outlier_threshold=3)),
+)
+
+
+def bpm_series(n=240, seed=0, spurious_rate=0.05):
+    """
+    Return (true, measured) BPM arrays with one value per window, and a
+    mask of the spurious values.
+    """
+    rng = np.random.RandomState(seed)
+    true = np.where(np.arange(n) < STEP_AT, 65.0, 95.0)
+    measured = np.round(true + rng.normal(0, 1.5, n))
+    spurious = rng.rand(n) < spurious_rate
+    measured[spurious] += rng.choice([-1, 1], spurious.sum()) * rng.uniform(25, 50, spurious.sum())
+    return true, measured, spurious
+
+
+def settle_windows(true, smoothed):
+    error = np.abs(smoothed - true)[STEP_AT:]
+    outside = np.nonzero(error[:40] > SETTLE_BPM)[0]
+    return outside[-1] + 1 if len(outside) else 0
+
+
+if __name__ == '__main__':
+    true, measured, spurious = bpm_series()
+    clean = bpm_series(spurious_rate=0.0)[1]
+    steady = np.ones(len(true), dtype=bool)
+    steady[:10] = False
+    steady[STEP_AT:STEP_AT + 20] = False
+
+    print("smoothing         settle (windows)  rms error  spurious max error  us/update")
+    for name, kwargs in SETTINGS:
+        smoother = BpmSmoother(**kwargs)
+        smoothed = np.array([smoother.update(v) for v in measured])
+        error = smoothed - true
+        rms = np.sqrt(np.mean(error[steady & ~spurious] ** 2))
+        worst = np.max(np.abs(error[steady & spurious]))
+
+        smoother = BpmSmoother(**kwargs)
+        settle = settle_windows(true, np.array([smoother.update(v) for v in clean]))
+
+        smoother = BpmSmoother(**kwargs)
+        values = measured.tolist()
+        seconds = timeit.timeit(lambda: [smoother.update(v) for v in values], number=20)
+        print("{0:17s} {1:16d} {2:10.2f} {3:19.1f} {4:10.2f}".format(
+            name, settle, rms, worst,
+            1e6 * seconds / (20 * len(values))))
@@ -0,0 +1,73 @@
+# -*-coding:utf-8
+"""
+Measure how long after the start of a session the first reading and the
+first stable reading are published, with and without progressive mode,
+by replaying recordings at virtual time.
+
+  python bench_startup.py [recording.ppg ...]
+
+A reading is stable once it and every later reading stay within
+TOLERANCE BPM of the session's reference value: the median of the
+second half of the readings. Each recording should start when the finger
+is put on the sensor. Without recordings, synthetic sessions at several
+heart rates are used.
+"""
+
+from replay import replay
+from synthetic import write_synthetic_recording
+from subscription import QUALITY_NO_FINGER
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+TOLERANCE = 5
+RATES = (55, 72, 90, 120)
+
+
+def startup_times(readings):
+    """
+    Return (time to first reading, time to stable reading) in seconds
+    since the start of the replay, None where there is none.
+    """
+    readings = [r for r in readings if r.quality != QUALITY_NO_FINGER]
+    if not readings:
+        return None, None
+    reference = np.median([r.bpm for r in readings[len(readings) // 2:]])
+    stable = None
+    for reading in reversed(readings):
+        if abs(reading.bpm - reference) > TOLERANCE:
+            break
+        stable = reading.timestamp
+    return readings[0].timestamp, stable
+
+
+def fmt(seconds):
+    return "    -" if seconds is None else "{0:5.1f}".format(seconds)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark time to first / stable reading")
+    parser.add_argument("files", nargs="*",
+                        help="recordings written with main.py -o, default synthetic")
+    args = parser.parse_args()
+
+    paths = args.files
+    if not paths:
+        directory = tempfile.mkdtemp()
+        for bpm in RATES:
+            path = os.path.join(directory, 'synthetic-{0}bpm.ppg'.format(bpm))
+            paths.append(write_synthetic_recording(path, 30, bpm=bpm, noise=200, seed=bpm))
+
+    print("                      first (s)     stable (s)     first")
+    print("recording            normal  prog  normal  prog  confidence")
+    for path in paths:
+        normal = replay(path)
+        progressive = replay(path, progressive=True)
+        first, stable = startup_times(normal['readings'])
+        p_first, p_stable = startup_times(progressive['readings'])
+        valid = [r for r in progressive['readings'] if r.quality != QUALITY_NO_FINGER]
+        print("{0:20s} {1}  {2}   {3}  {4}  {5:10.2f}".format(
+            os.path.basename(path)[-20:], fmt(first), fmt(p_first),
+            fmt(stable), fmt(p_stable), valid[0].confidence if valid else 0.0))
@@ -0,0 +1,71 @@
+# -*-coding:utf-8
+"""
+Measure how much HeartRateMonitor's calculations disturb an application
+loop (like the 10 ms loop in my_project.py), with hrcalc running in-process
+and in a worker process.
+
+  python bench_worker.py [recording.ppg] [-s SPEED] [--hop N]
+
+The recording is replayed at SPEED times real time while the main thread
+runs a 10 ms sleep loop and records how late each iteration wakes up.
+Without a recording one minute of synthetic signal is used.
+"""
+
+from replay import replay
+from synthetic import write_synthetic_recording
+import numpy as np
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+UI_LOOP_TIME = 0.01
+
+
+def ui_loop(done):
+    """
+    Sleep in UI_LOOP_TIME steps until `done` is set and return how late
+    each wakeup was, in seconds.
+    """
+    lateness = []
+    while not done.is_set():
+        start = time.perf_counter()
+        time.sleep(UI_LOOP_TIME)
+        lateness.append(time.perf_counter() - start - UI_LOOP_TIME)
+    return np.array(lateness)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark UI loop jitter with an in-process / out-of-process hrcalc")
+    parser.add_argument("file", nargs="?", default=None,
+                        help="recording written with main.py -o, default synthetic")
+    parser.add_argument("-s", "--speed", type=float, default=4.0,
+                        help="replay speed relative to real time, default 4")
+    parser.add_argument("--hop", type=int, default=1,
+                        help="hop_samples for the monitor, default 1 (heaviest)")
+    args = parser.parse_args()
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.ppg')
+        write_synthetic_recording(path, 60, noise=200)
+
+    print("worker       windows  jitter mean (ms)  p99 (ms)  max (ms)")
+    for name, process_worker in (("in-process", False), ("process", True)):
+        done = threading.Event()
+        results = []
+
+        def run():
+            results.append(replay(path, speed=args.speed, hop_samples=args.hop,
+                                  process_worker=process_worker))
+            done.set()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        lateness = ui_loop(done)
+        thread.join()
+
+        print("{0:12s} {1:7d} {2:17.3f} {3:9.3f} {4:9.3f}".format(
+            name, results[0]['pipeline']['windows'], 1000 * lateness.mean(),
+            1000 * np.percentile(lateness, 99), 1000 * lateness.max()))
@@ -0,0 +1,129 @@
+# -*-coding:utf-8
+
+from collections import deque, namedtuple
+import threading
+
+import numpy as np
+
+# one FIFO drain: when it was read, the red / ir samples it contained,
+# the (interpolated) time of each sample as a float64 array and the number
+# of samples the sensor lost to a full FIFO before the drain
+SampleBlock = namedtuple('SampleBlock', ['timestamp', 'red', 'ir', 'times', 'overflow'],
+                         defaults=(0,))
+
+# what to do with a new block when the queue is already full
+# merge it into the newest queued block: the compute stage sees fewer,
+# larger blocks; samples are only lost once the merged block grows past
+# `max_block_samples` (the oldest ones are trimmed)
+POLICY_COALESCE = 'coalesce'
+# discard the oldest queued block to make room
+POLICY_DROP_OLDEST = 'drop_oldest'
+# discard the new block
+POLICY_DROP_NEWEST = 'drop_newest'
+# make put wait for room; only for sources that cannot overflow, such as
+# a replay, where processing every block matters more than keeping up
+POLICY_WAIT = 'wait'
+
+POLICIES = (POLICY_COALESCE, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_WAIT)
+
+
+class BlockQueue(object):
+    """
+    A bounded queue of SampleBlocks between the acquisition and compute
+    stages. Except with POLICY_WAIT, `put` never blocks, so a slow consumer
+    can never stall the FIFO drain; instead the overflow policy decides
+    what is given up.
+    """
+
+    def __init__(self, maxsize=8, policy=POLICY_COALESCE, max_block_samples=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if policy not in POLICIES:
+            raise ValueError("Unknown queue policy: {0}".format(policy))
+        if max_block_samples is not None and max_block_samples < 1:
+            raise ValueError("max_block_samples must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        # a coalesced block keeps at most this many (the newest) samples, so
+        # a stalled consumer cannot make every put copy an ever larger block
+        self.max_block_samples = max_block_samples
+        self._blocks = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # counters, only ever increased
+        self.blocks_put = 0
+        self.blocks_coalesced = 0
+        self.blocks_dropped = 0
+        self.samples_dropped = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def put(self, block):
+        """
+        Queue a block, applying the overflow policy when the queue is
+        full. Returns the queue depth after the put.
+        """
+        with self._cond:
+            self.blocks_put += 1
+            if self.policy == POLICY_WAIT:
+                self._cond.wait_for(
+                    lambda: len(self._blocks) < self.maxsize or self._closed)
+            if len(self._blocks) >= self.maxsize:
+                if self.policy == POLICY_COALESCE:
+                    last = self._blocks[-1]
+                    keep = len(last.ir) + len(block.ir)
+                    trim = 0
+                    if self.max_block_samples is not None and keep > self.max_block_samples:
+                        trim = keep - self.max_block_samples
+                    # keep the older timestamp so lag is not under-reported
+                    self._blocks[-1] = SampleBlock(last.timestamp,
+                                                   np.concatenate((last.red, block.red))[trim:],
+                                                   np.concatenate((last.ir, block.ir))[trim:],
+                                                   np.concatenate((last.times, block.times))[trim:],
+                                                   last.overflow + block.overflow)
+                    self.blocks_coalesced += 1
+                    self.samples_dropped += trim
+                    self._cond.notify_all()
+                    return len(self._blocks)
+                elif self.policy == POLICY_DROP_OLDEST:
+                    dropped = self._blocks.popleft()
+                else:
+                    # POLICY_DROP_NEWEST, or POLICY_WAIT after close
+                    dropped = block
+                    block = None
+                self.blocks_dropped += 1
+                self.samples_dropped += len(dropped.ir)
+
+            if block is not None:
+                self._blocks.append(block)
+                self.max_depth = max(self.max_depth, len(self._blocks))
+                self._cond.notify_all()
+            return len(self._blocks)
+
+    def get(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for a block. Returns None on timeout
+        or once the queue has been closed and drained.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._blocks or self._closed, timeout)
+            if self._blocks:
+                block = self._blocks.popleft()
+                # wake a producer waiting for room
+                self._cond.notify_all()
+                return block
+            return None
+
+    def close(self):
+        """
+        Wake any waiting consumer; queued blocks can still be read.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def is_closed(self):
+        return self._closed
@@ -0,0 +1,54 @@
+# -*-coding:utf-8
+
+import threading
+import time
+
+
+class SystemClock(object):
+    """
+    The real monotonic clock. HeartRateMonitor reads time and sleeps only
+    through a clock object so that replays can substitute a VirtualClock.
+    """
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock(object):
+    """
+    A clock for replaying recorded sessions.
+
+    With `speed=None` time only moves when somebody sleeps: `sleep(dt)`
+    advances the clock by `dt` and returns immediately, so a replay runs as
+    fast as the CPU allows. With a number, virtual time runs `speed` times
+    faster than real time (1.0 reproduces the original pacing).
+    """
+
+    def __init__(self, start=0.0, speed=None):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = speed
+        self._start = start
+        self._now = start
+        self._real_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def now(self):
+        if self.speed is None:
+            return self._now
+        return self._start + (time.monotonic() - self._real_start) * self.speed
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.speed is None:
+            with self._lock:
+                self._now += seconds
+            # still give the other threads a chance to run
+            time.sleep(0)
+        else:
+            time.sleep(seconds / self.speed)
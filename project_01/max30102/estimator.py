@@ -0,0 +1,153 @@
+# -*-coding:utf-8
+
+from collections import namedtuple
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+import hrcalc
+
+# outcome of one hrcalc window, plus what HeartRateMonitor needs besides
+# the window itself (so the window never has to travel back)
+Estimate = namedtuple('Estimate', ['bpm', 'valid_bpm', 'spo2', 'valid_spo2',
+                                   'ir_mean', 'red_mean', 'samples', 'seconds'])
+
+
+def estimate(ir_window, red_window, sample_rate=hrcalc.SAMPLE_FREQ):
+    start = time.perf_counter()
+    bpm, valid_bpm, spo2, valid_spo2 = hrcalc.calc_hr_and_spo2(ir_window, red_window, sample_rate)
+    return Estimate(bpm, valid_bpm, spo2, valid_spo2,
+                    float(np.mean(ir_window)), float(np.mean(red_window)),
+                    len(ir_window), time.perf_counter() - start)
+
+
+class InlineEstimator(object):
+    """
+    Runs hrcalc on the calling thread. `on_result(tag, estimate)` is called
+    before `submit` returns.
+    """
+
+    def __init__(self, window_size, on_result):
+        self.on_result = on_result
+
+    def submit(self, ir_window, red_window, tag=None, sample_rate=hrcalc.SAMPLE_FREQ):
+        self.on_result(tag, estimate(ir_window, red_window, sample_rate))
+
+    def close(self):
+        pass
+
+
+def _worker_main(shm_name, slots, window_size, conn):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    windows = np.ndarray((slots, 2, window_size), dtype=np.int32, buffer=shm.buf)
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            slot, size, sample_rate = request
+            conn.send(estimate(windows[slot, 0, :size], windows[slot, 1, :size], sample_rate))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del windows
+        shm.close()
+
+
+class ProcessEstimator(object):
+    """
+    Runs hrcalc in a separate process so that the numpy work does not
+    compete for the GIL with the rest of the application.
+
+    Windows (of up to `window_size` samples) are copied into a ring of
+    `slots` shared memory slots and only the slot number, window length
+    and sample rate are sent over a pipe; the worker answers with a small
+    Estimate. A receiver thread calls `on_result(tag, estimate)` for each
+    window, in submission order. `submit` blocks while all slots are still
+    being worked on, and raises BrokenPipeError once the worker is gone.
+
+    The worker is started with 'forkserver' (or 'spawn' where that is not
+    available), never with 'fork': the monitor is already multithreaded
+    when it starts the worker, and forking a process with running threads
+    can deadlock the child. Like with any non-fork start method, a script
+    that uses the worker must guard its entry point with
+    `if __name__ == '__main__':`.
+    """
+
+    def __init__(self, window_size, on_result, slots=4):
+        from multiprocessing import shared_memory
+        self.on_result = on_result
+        self.slots = slots
+        self.window_size = window_size
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * 2 * window_size * 4)
+        self._windows = np.ndarray((slots, 2, window_size), dtype=np.int32, buffer=self._shm.buf)
+        self._free = threading.Semaphore(slots)
+        self._worker_gone = False
+        self._tags = [None] * slots
+        self._next_slot = 0
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_worker_main,
+                                        args=(self._shm.name, slots, window_size, child_conn))
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+        self._receiver = threading.Thread(target=self._receive)
+        self._receiver.daemon = True
+        self._receiver.start()
+
+    def submit(self, ir_window, red_window, tag=None, sample_rate=hrcalc.SAMPLE_FREQ):
+        self._free.acquire()
+        if self._worker_gone:
+            # keep the slots free so later calls fail the same way
+            self._free.release()
+            raise BrokenPipeError("hrcalc worker process is gone")
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.slots
+        size = len(ir_window)
+        self._windows[slot, 0, :size] = ir_window
+        self._windows[slot, 1, :size] = red_window
+        self._tags[slot] = tag
+        self._conn.send((slot, size, sample_rate))
+
+    def _receive(self):
+        # the worker answers in order, so results map to slots round robin
+        slot = 0
+        while True:
+            try:
+                result = self._conn.recv()
+            except (EOFError, OSError):
+                # the worker exited (or close() ran): wake a blocked submit
+                self._worker_gone = True
+                self._free.release()
+                break
+            tag = self._tags[slot]
+            slot = (slot + 1) % self.slots
+            self._free.release()
+            self.on_result(tag, result)
+
+    def close(self, timeout=2.0):
+        """
+        Let the worker finish the submitted windows, then stop it. Safe to
+        call more than once.
+        """
+        if self._shm is None:
+            return
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._receiver.join(timeout)
+        self._conn.close()
+        del self._windows
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
@@ -1,73 +1,570 @@
 
-from max30102 import MAX30102
+from max30102 import MAX30102, FIFO_DEPTH
+from ring_buffer import RingBuffer
+from clock import SystemClock
+from timestamps import SampleTimer
+from block_queue import BlockQueue, SampleBlock, POLICY_COALESCE
+from recorder import PPGRecorder
+from polling import AdaptivePoller
+from led_control import LedCurrentControl
+from smoothing import BpmSmoother, RollingWindow, SMOOTH_MEAN
+from estimator import InlineEstimator, ProcessEstimator
+from metrics import Metrics, NullMetrics, LATENCY_BOUNDS
+from output import OutputSink, FORMAT_TEXT
+from subscription import (ReadingBroker, Reading, SLOW_DROP_OLDEST,
+                          QUALITY_NO_FINGER, QUALITY_BPM_ONLY, QUALITY_GOOD)
 import hrcalc
 import threading
-import time
 import numpy as np
 
 
 class HeartRateMonitor(object):
     """
-    A class that encapsulates the max30102 device into a thread
+    A class that encapsulates the max30102 device into two threads:
+    an acquisition stage that only drains the sensor FIFO into blocks,
+    and a compute stage that windows the blocks and runs hrcalc. The
+    stages are connected by a bounded BlockQueue, so a slow calculation
+    never delays the next FIFO drain.
+
+    Results are published as Readings: use `subscribe()` to wait for new
+    ones or `add_callback()` to be called with each one. `bpm` and `spo2`
+    still hold the newest values for callers that poll.
+
+    `print_raw` / `print_result` send raw samples / results to `output`,
+    an OutputSink that batches them and writes from its own thread (by
+    default text on stdout), so slow consoles never hold up the pipeline.
+
+    Pass `record_path` to also write every raw sample to a PPGRecorder
+    file (see recorder.py).
+
+    `sensor_factory` and `clock` replace the MAX30102 and the real clock,
+    e.g. with a ReplaySensor and VirtualClock (see replay.py).
+
+    `window_size` is the number of samples per calculation. A new window
+    is calculated once `hop_samples` new samples have arrived or `hop_time`
+    seconds have passed since the last one, whichever comes first; with
+    both None every FIFO drain triggers a calculation. Run bench_schedule.py
+    to see what each setting costs.
+
+    Every sample gets a time interpolated from the FIFO drains and
+    `sample_rate` holds a running estimate of the real sample rate. With
+    `use_measured_rate=True` hrcalc converts beat intervals to BPM with the
+    rate measured over each window instead of the nominal 25 Hz.
+
+    With `adaptive_poll=True` the acquisition loop sleeps until the FIFO is
+    predicted to hold POLL_TARGET_FILL samples (never letting it come close
+    to full) instead of waking every LOOP_TIME; see polling.py.
+
+    With `process_worker=True` hrcalc runs in a separate process that gets
+    its windows through shared memory (see estimator.py), so the numpy
+    work does not hold the GIL of the application's own threads. This only
+    pays off with a spare CPU core. If the worker dies, the calculation
+    falls back to the compute thread.
+
+    With `progressive=True` provisional readings are published before the
+    first window is full: from PROGRESSIVE_MIN samples on, every
+    PROGRESSIVE_HOP samples, as soon as hrcalc finds two beats. Their
+    `confidence` grows with the share of the window they are based on.
+
+    The reported BPM is the `smoothing` (mean, median or ema) of the last
+    `smoothing_horizon` valid windows. With `outlier_threshold` set, values
+    that deviate from the recent median by more than that many standard
+    deviations are replaced by it first; see smoothing.py and
+    bench_smoothing.py.
+
+    With `idle_detect=True` the monitor parks the sensor in its low power
+    proximity mode once no finger has been seen for IDLE_AFTER seconds.
+    The acquisition thread then only checks the proximity flag every
+    IDLE_POLL_TIME and switches back to full sampling when it is set.
+
+    With `led_control=True` the LED currents follow the DC level of the
+    signal so that it neither clips nor sinks into the noise; see
+    led_control.py.
+
+    With `instrument=True` every stage is timed into latency histograms and
+    window / overrun counters are kept; read them with `get_metrics()`.
+    When disabled the hooks are no-ops.
     """
 
     LOOP_TIME = 0.01
+    # FIFO fill level the adaptive poller aims to wake up at
+    POLL_TARGET_FILL = 16
+    # default number of samples handed to hrcalc per calculation
+    WINDOW_SIZE = hrcalc.BUFFER_SIZE
+    # default number of new samples between calculations (1 s at 25 Hz)
+    HOP_SAMPLES = 25
+    # default number of valid BPM values smoothed into the reported value
+    BPM_AVERAGE = 4
+    # samples needed before a provisional calculation is tried (1 s at 25 Hz)
+    PROGRESSIVE_MIN = 25
+    # new samples between provisional calculations
+    PROGRESSIVE_HOP = 12
+    # mean IR or red level below which no finger is on the sensor
+    FINGER_THRESHOLD = 50000
+    # seconds without a finger before the sensor goes idle
+    IDLE_AFTER = 10.0
+    # seconds between proximity checks while idle
+    IDLE_POLL_TIME = 0.25
 
-    def __init__(self, print_raw=False, print_result=False):
+    def __init__(self, print_raw=False, print_result=False,
+                 queue_size=8, queue_policy=POLICY_COALESCE, record_path=None,
+                 sensor_factory=MAX30102, clock=None,
+                 window_size=WINDOW_SIZE, hop_samples=HOP_SAMPLES, hop_time=None,
+                 instrument=False, adaptive_poll=False, process_worker=False,
+                 output=None, use_measured_rate=False, idle_detect=False,
+                 led_control=False, progressive=False, smoothing=SMOOTH_MEAN,
+                 smoothing_horizon=BPM_AVERAGE, outlier_threshold=None):
         self.bpm = 0
-        if print_raw is True:
+        self.spo2 = None
+        self.readings = ReadingBroker()
+        if print_raw is True and output is None:
             print('IR, Red')
         self.print_raw = print_raw
         self.print_result = print_result
+        self.output = output
+        self.use_measured_rate = use_measured_rate
+        self.sample_rate = float(hrcalc.SAMPLE_FREQ)
+        # whether the sink was created here and must be closed on stop
+        self._own_output = False
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self.record_path = record_path
+        self.sensor_factory = sensor_factory
+        self.clock = clock if clock is not None else SystemClock()
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        self.window_size = window_size
+        self.hop_samples = hop_samples
+        self.hop_time = hop_time
+        self.adaptive_poll = adaptive_poll
+        self.process_worker = process_worker
+        self.idle_detect = idle_detect
+        self.led_control = led_control
+        self.progressive = progressive
+        # checks the arguments now rather than in the compute thread
+        self._smoother = BpmSmoother(smoothing, smoothing_horizon, outlier_threshold)
+        self.idle = False
+        # set by the compute thread when the sensor should go idle
+        self._idle_request = threading.Event()
+        # time the sensor last left the idle mode, older samples are stale
+        self._awake_since = float('-inf')
+        self._finger_off_since = None
+        self.metrics = Metrics() if instrument else NullMetrics()
+        self._queue = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        # acquisition stage
+        self.wakeups = 0
+        self.drains = 0
+        self.samples_read = 0
+        self.samples_lost = 0
+        self.worker_failures = 0
+        self.acquire_depth = 0
+        self.acquire_lag = 0.0
+        self.acquire_max_lag = 0.0
+        self.idle_entries = 0
+        self.idle_polls = 0
+        self.idle_seconds = 0.0
+        self.led_adjustments = 0
+        self.red_pa = None
+        self.ir_pa = None
+        # compute stage
+        self.windows = 0
+        # time spent inside hrcalc
+        self.compute_seconds = 0.0
+        self.compute_depth = 0
+        self.compute_lag = 0.0
+        self.compute_max_lag = 0.0
+        self._smoother.outliers = 0
+        self.metrics.reset()
 
     def run_sensor(self):
-        sensor = MAX30102()
-        ir_data = []
-        red_data = []
-        bpms = []
+        """
+        Acquisition stage: poll the FIFO and hand each drain to the
+        compute stage as one SampleBlock. Nothing in here waits on the
+        compute stage.
+        """
+        sensor = self.sensor_factory()
+        clock = self.clock
+        metrics = self.metrics
+        recorder = None
+        if self.record_path is not None:
+            recorder = PPGRecorder(self.record_path, hrcalc.SAMPLE_FREQ)
+        poller = None
+        if self.adaptive_poll:
+            poller = AdaptivePoller(sensor.effective_sample_rate(), self.POLL_TARGET_FILL)
+        timer = SampleTimer(sensor.effective_sample_rate())
+        agc = None
+        if self.led_control:
+            agc = LedCurrentControl(sensor.red_pa, sensor.ir_pa)
+        self.red_pa = sensor.red_pa
+        self.ir_pa = sensor.ir_pa
+        next_wakeup = clock.now()
 
         # run until told to stop
         while not self._thread.stopped:
+            if self._idle_request.is_set():
+                self._wait_for_finger(sensor)
+                # the idle gap says nothing about the sample rate
+                timer.reset()
+                if agc is not None:
+                    agc.reset()
+                if poller is not None:
+                    poller = AdaptivePoller(sensor.effective_sample_rate(), self.POLL_TARGET_FILL)
+                next_wakeup = clock.now()
+                continue
+
+            # how late this wakeup is compared to the loop schedule
+            lag = max(0.0, clock.now() - next_wakeup)
+            self.acquire_lag = lag
+            self.acquire_max_lag = max(self.acquire_max_lag, lag)
+            self.wakeups += 1
+            metrics.count('wakeups')
+
             # check if any data is available
+            start = metrics.time()
             num_bytes = sensor.get_data_present()
+            overflow = 0
+            if num_bytes == 0:
+                # a full FIFO reads as empty; only then can samples be lost
+                overflow = sensor.get_overflow_count()
+                if overflow:
+                    num_bytes = FIFO_DEPTH
+            metrics.observe('get_data_present', start)
+            metrics.value('samples_per_wakeup', num_bytes)
             if num_bytes > 0:
-                # grab all the data and stash it into arrays
-                while num_bytes > 0:
-                    red, ir = sensor.read_fifo()
-                    num_bytes -= 1
-                    ir_data.append(ir)
-                    red_data.append(red)
-                    if self.print_raw:
-                        print("{0}, {1}".format(ir, red))
-
-                while len(ir_data) > 100:
-                    ir_data.pop(0)
-                    red_data.pop(0)
-
-                if len(ir_data) == 100:
-                    bpm, valid_bpm, spo2, valid_spo2 = hrcalc.calc_hr_and_spo2(ir_data, red_data)
-                    if valid_bpm:
-                        bpms.append(bpm)
-                        while len(bpms) > 4:
-                            bpms.pop(0)
-                        self.bpm = np.mean(bpms)
-                        if (np.mean(ir_data) < 50000 and np.mean(red_data) < 50000):
-                            self.bpm = 0
-                            if self.print_result:
-                                print("Finger not detected")
-                        if self.print_result:
-                            print("BPM: {0}, SpO2: {1}".format(self.bpm, spo2))
-
-            time.sleep(self.LOOP_TIME)
+                # grab all the data and stash it into one block
+                start = metrics.time()
+                red_block = np.empty(num_bytes, dtype=np.int32)
+                ir_block = np.empty(num_bytes, dtype=np.int32)
+                for i in range(num_bytes):
+                    red_block[i], ir_block[i] = sensor.read_fifo()
+                metrics.observe('read_fifo', start)
+
+                now = clock.now()
+                block = SampleBlock(now, red_block, ir_block, timer.stamp(now, num_bytes), overflow)
+                self.sample_rate = timer.rate
+                if agc is not None:
+                    red_pa, ir_pa = agc.update(now, red_block, ir_block)
+                    # the driver skips amplitudes that did not change
+                    sensor.set_led_amplitudes(red_pa, ir_pa)
+                    self.red_pa = red_pa
+                    self.ir_pa = ir_pa
+                    self.led_adjustments = agc.adjustments
+                if recorder is not None:
+                    start = metrics.time()
+                    recorder.write_block(block.times, block.red, block.ir, block.overflow)
+                    metrics.observe('record', start)
+                start = metrics.time()
+                self.acquire_depth = self._queue.put(block)
+                metrics.observe('queue_put', start)
+                if self.print_raw:
+                    start = metrics.time()
+                    self.output.write_raw(block.times, block.ir, block.red)
+                    metrics.observe('output', start)
+                self.drains += 1
+                self.samples_read += num_bytes
+                self.samples_lost += overflow
+
+            if poller is not None:
+                now = clock.now()
+                next_wakeup = now + poller.update(now, num_bytes)
+            else:
+                next_wakeup += self.LOOP_TIME
+            delay = next_wakeup - clock.now()
+            if delay > 0:
+                clock.sleep(delay)
+            else:
+                # fell behind; restart the schedule instead of bursting
+                next_wakeup = clock.now()
+                metrics.count('loop_overruns')
 
         sensor.shutdown()
+        if recorder is not None:
+            recorder.close()
+        self._queue.close()
+
+    def _wait_for_finger(self, sensor):
+        """
+        Put the sensor in proximity mode and check its proximity flag every
+        IDLE_POLL_TIME until a finger shows up or the monitor is stopped.
+        """
+        clock = self.clock
+        start = clock.now()
+        sensor.enter_proximity_mode()
+        self.idle = True
+        self.idle_entries += 1
+        self.metrics.count('idle_entries')
+        self.bpm = 0
+        self.spo2 = None
+        while not self._thread.stopped:
+            clock.sleep(self.IDLE_POLL_TIME)
+            self.idle_polls += 1
+            if sensor.proximity_triggered():
+                break
+        sensor.exit_proximity_mode()
+        self._awake_since = clock.now()
+        self.idle_seconds += self._awake_since - start
+        self._idle_request.clear()
+        self.idle = False
+
+    def run_compute(self):
+        """
+        Compute stage: consume blocks from the queue, keep the latest
+        window of samples and hand it to the estimator on the configured
+        schedule. Results come back through _handle_estimate.
+        """
+        ir_data = RingBuffer(self.window_size)
+        red_data = RingBuffer(self.window_size)
+        times = RingBuffer(self.window_size, dtype=np.float64)
+        self._smoother.reset()
+        # whether the last BPM came from a full window
+        self._full_window = False
+        # share of a full window behind each value in the smoother
+        self._shares = RollingWindow(self._smoother.horizon)
+        if self.process_worker:
+            estimator = ProcessEstimator(self.window_size, self._handle_estimate)
+        else:
+            estimator = InlineEstimator(self.window_size, self._handle_estimate)
+        try:
+            self._compute_loop(estimator, ir_data, red_data, times)
+        finally:
+            # always release the worker and its shared memory
+            estimator.close()
+
+    def _compute_loop(self, estimator, ir_data, red_data, times):
+        """
+        The loop of run_compute. If the worker process dies, the rest of
+        the windows are calculated on this thread.
+        """
+        metrics = self.metrics
+        # new samples since the last calculation and when it happened
+        pending = 0
+        last_compute = None
+        awake_since = self._awake_since
+
+        while True:
+            block = self._queue.get(timeout=0.5)
+            if block is None:
+                if self._queue.is_closed():
+                    break
+                continue
+
+            if block.timestamp < self._awake_since:
+                # drained before the sensor went idle
+                continue
+            if awake_since != self._awake_since:
+                # back from idle, start over with a fresh window
+                awake_since = self._awake_since
+                ir_data.clear()
+                red_data.clear()
+                times.clear()
+                pending = 0
+                last_compute = None
+
+            self.compute_depth = len(self._queue)
+            lag = self.clock.now() - block.timestamp
+            self.compute_lag = lag
+            self.compute_max_lag = max(self.compute_max_lag, lag)
+
+            start = metrics.time()
+            ir_data.extend(block.ir)
+            red_data.extend(block.red)
+            times.extend(block.times)
+            metrics.observe('window_update', start)
+            pending += len(block.ir)
+
+            if ir_data.is_full():
+                due = self._window_due(pending, last_compute)
+            else:
+                due = (self.progressive and len(ir_data) >= self.PROGRESSIVE_MIN and
+                       (last_compute is None or pending >= self.PROGRESSIVE_HOP))
+            if due:
+                # a block holding several hops' worth of samples still only
+                # gets one calculation, on its newest window
+                pending = 0
+                last_compute = self.clock.now()
+                sample_rate = hrcalc.SAMPLE_FREQ
+                if self.use_measured_rate:
+                    window_times = times.latest()
+                    span = window_times[-1] - window_times[0]
+                    if span > 0:
+                        sample_rate = (len(window_times) - 1) / span
+                try:
+                    estimator.submit(ir_data.latest(), red_data.latest(), block.timestamp, sample_rate)
+                except (BrokenPipeError, EOFError):
+                    # the worker process died: carry on in this thread
+                    estimator.close()
+                    estimator = InlineEstimator(self.window_size, self._handle_estimate)
+                    self.worker_failures += 1
+                    metrics.count('worker_failures')
+                    estimator.submit(ir_data.latest(), red_data.latest(), block.timestamp, sample_rate)
+
+    def _handle_estimate(self, timestamp, estimate):
+        """
+        Turn one hrcalc result into bpm / spo2 and publish it. Called
+        once per window, in order, from a single thread.
+        """
+        metrics = self.metrics
+        self.compute_seconds += estimate.seconds
+        metrics.value('hrcalc', estimate.seconds, LATENCY_BOUNDS)
+        self.windows += 1
+        metrics.count('windows_computed')
+        finger = (estimate.ir_mean >= self.FINGER_THRESHOLD or
+                  estimate.red_mean >= self.FINGER_THRESHOLD)
+        if self.idle_detect:
+            self._track_finger(timestamp, finger)
+        if not estimate.valid_bpm:
+            metrics.count('windows_invalid_hr')
+            return
+
+        full_window = estimate.samples >= self.window_size
+        if self._full_window and not full_window:
+            # starting over (e.g. after being idle), the old values do not
+            # belong in the average of the new session
+            self._smoother.reset()
+            self._shares.clear()
+        self._full_window = full_window
+        self.bpm = self._smoother.update(estimate.bpm)
+        # provisional values stay in the average until full windows push
+        # them out, so the confidence is the mean share of a full window of
+        # the values smoothed into the reading; it only grows in a session
+        self._shares.append(min(1.0, float(estimate.samples) / self.window_size))
+        confidence = self._shares.mean() * len(self._shares) / float(self._shares.size)
+        self.spo2 = estimate.spo2 if estimate.valid_spo2 else None
+        quality = QUALITY_GOOD if estimate.valid_spo2 else QUALITY_BPM_ONLY
+        if not finger:
+            self.bpm = 0
+            self.spo2 = None
+            quality = QUALITY_NO_FINGER
+            confidence = 1.0
+            metrics.count('windows_no_finger')
+        reading = Reading(timestamp, float(self.bpm), self.spo2, quality, confidence)
+        if self.print_result:
+            start = metrics.time()
+            self.output.write_result(reading)
+            metrics.observe('output', start)
+        start = metrics.time()
+        self.readings.publish(reading)
+        metrics.observe('publish', start)
+
+    def _track_finger(self, timestamp, finger):
+        if timestamp < self._awake_since:
+            # a window from before the last idle period
+            return
+        if finger:
+            self._finger_off_since = None
+        elif self._finger_off_since is None or self._finger_off_since < self._awake_since:
+            self._finger_off_since = timestamp
+        elif timestamp - self._finger_off_since >= self.IDLE_AFTER:
+            self._idle_request.set()
+
+    def _window_due(self, pending, last_compute):
+        if self.hop_samples is None and self.hop_time is None:
+            return True
+        if last_compute is None:
+            return True
+        if self.hop_samples is not None and pending >= self.hop_samples:
+            return True
+        if self.hop_time is not None and self.clock.now() - last_compute >= self.hop_time:
+            return True
+        return False
+
+    def subscribe(self, max_lag=None, policy=SLOW_DROP_OLDEST):
+        """
+        Return a Subscription with its own cursor over the published
+        Readings. Call `get(timeout)` on it, or iterate over it (also
+        with `async for`); iteration ends when the sensor is stopped.
+        See subscription.py for the slow subscriber policies.
+        """
+        return self.readings.subscribe(max_lag, policy)
+
+    def add_callback(self, callback):
+        """
+        Call `callback(reading)` for each Reading, from the thread that
+        publishes it: the compute thread, or the result receiver thread
+        when the calculation runs in a worker process.
+        """
+        self.readings.add_callback(callback)
+
+    def remove_callback(self, callback):
+        self.readings.remove_callback(callback)
+
+    def get_metrics(self):
+        """
+        Return a snapshot of the instrumentation as plain dicts:
+        `histograms` holds per-stage latencies in seconds (get_data_present,
+        read_fifo, record, queue_put, output, window_update, hrcalc, publish)
+        and `samples_per_wakeup`; `counters` holds windows_computed,
+        windows_invalid_hr, windows_no_finger, wakeups, loop_overruns and
+        idle_entries. Empty when
+        the monitor was created without `instrument=True`.
+        """
+        return self.metrics.snapshot()
+
+    def get_pipeline_stats(self):
+        """
+        Return a dict with the queue depth and lag seen by each stage.
+        `acquire_*_lag` is how late the FIFO drain woke up compared to its
+        schedule; `compute_*_lag` is how long a block sat in the queue.
+        """
+        queue = self._queue
+        return {
+            'queue_depth': len(queue) if queue is not None else 0,
+            'queue_max_depth': queue.max_depth if queue is not None else 0,
+            'blocks_coalesced': queue.blocks_coalesced if queue is not None else 0,
+            'blocks_dropped': queue.blocks_dropped if queue is not None else 0,
+            'samples_dropped': queue.samples_dropped if queue is not None else 0,
+            'sample_rate': self.sample_rate,
+            'wakeups': self.wakeups,
+            'drains': self.drains,
+            'samples_read': self.samples_read,
+            'samples_lost': self.samples_lost,
+            'worker_failures': self.worker_failures,
+            'acquire_depth': self.acquire_depth,
+            'acquire_lag': self.acquire_lag,
+            'acquire_max_lag': self.acquire_max_lag,
+            'idle_entries': self.idle_entries,
+            'idle_polls': self.idle_polls,
+            'idle_seconds': self.idle_seconds,
+            'red_pa': self.red_pa,
+            'ir_pa': self.ir_pa,
+            'led_adjustments': self.led_adjustments,
+            'windows': self.windows,
+            'compute_seconds': self.compute_seconds,
+            'compute_depth': self.compute_depth,
+            'compute_lag': self.compute_lag,
+            'compute_max_lag': self.compute_max_lag,
+            'bpm_outliers': self._smoother.outliers,
+            'output': self.output.stats() if self.output is not None else None,
+        }
 
     def start_sensor(self):
+        self._reset_stats()
+        self._idle_request.clear()
+        self._awake_since = float('-inf')
+        self._finger_off_since = None
+        # a window is all the compute stage can use from one block
+        self._queue = BlockQueue(self.queue_size, self.queue_policy, self.window_size)
+        self.readings.reopen()
+        if (self.print_raw or self.print_result) and (self.output is None or self._own_output):
+            self.output = OutputSink(fmt=FORMAT_TEXT)
+            self._own_output = True
+        self._compute_thread = threading.Thread(target=self.run_compute)
+        self._compute_thread.start()
         self._thread = threading.Thread(target=self.run_sensor)
         self._thread.stopped = False
         self._thread.start()
 
     def stop_sensor(self, timeout=2.0):
         self._thread.stopped = True
-        self.bpm = 0
         self._thread.join(timeout)
+        # in case the acquisition thread did not exit in time
+        self._queue.close()
+        self._compute_thread.join(timeout)
+        self.readings.close()
+        if self._own_output:
+            self.output.close()
+        self.bpm = 0
+        self.spo2 = None
@@ -8,21 +8,24 @@ SAMPLE_FREQ = 25
 # in algorithm.h, "DONOT CHANGE" comment is attached
 MA_SIZE = 4
 # sampling frequency * 4 (in algorithm.h)
+# this is the default window; calc_hr_and_spo2 works on any window length
 BUFFER_SIZE = 100
 
 
-# this assumes ir_data and red_data as np.array
-def calc_hr_and_spo2(ir_data, red_data):
+# ir_data and red_data may be lists or np.arrays (e.g. RingBuffer views)
+def calc_hr_and_spo2(ir_data, red_data, sample_rate=SAMPLE_FREQ):
     """
     By detecting  peaks of PPG cycle and corresponding AC/DC
     of red/infra-red signal, the an_ratio for the SPO2 is computed.
+    sample_rate (samples per second) converts peak intervals to BPM.
     """
     # get dc mean
     ir_mean = int(np.mean(ir_data))
 
     # remove DC mean and inver signal
     # this lets peak detecter detect valley
-    x = -1 * (np.array(ir_data) - ir_mean)
+    # (np.asarray avoids a copy when the caller already passes an array)
+    x = -1 * (np.asarray(ir_data) - ir_mean)
 
     # 4 point moving average
     # x is np.array with int values, so automatically casted to int
@@ -34,14 +37,15 @@ def calc_hr_and_spo2(ir_data, red_data):
     n_th = 30 if n_th < 30 else n_th  # min allowed
     n_th = 60 if n_th > 60 else n_th  # max allowed
 
-    ir_valley_locs, n_peaks = find_peaks(x, BUFFER_SIZE, n_th, 4, 15)
+    size = x.shape[0]
+    ir_valley_locs, n_peaks = find_peaks(x, size, n_th, 4, 15)
     # print(ir_valley_locs[:n_peaks], ",", end="")
     peak_interval_sum = 0
     if n_peaks >= 2:
         for i in range(1, n_peaks):
             peak_interval_sum += (ir_valley_locs[i] - ir_valley_locs[i-1])
         peak_interval_sum = int(peak_interval_sum / (n_peaks - 1))
-        hr = int(SAMPLE_FREQ * 60 / peak_interval_sum)
+        hr = int(sample_rate * 60 / peak_interval_sum)
         hr_valid = True
     else:
         hr = -999  # unable to calculate because # of peaks are too small
@@ -57,11 +61,17 @@ def calc_hr_and_spo2(ir_data, red_data):
 
     # FIXME: needed??
     for i in range(exact_ir_valley_locs_count):
-        if ir_valley_locs[i] > BUFFER_SIZE:
+        if ir_valley_locs[i] > size:
             spo2 = -999  # do not use SPO2 since valley loc is out of range
             spo2_valid = False
             return hr, hr_valid, spo2, spo2_valid
 
+    # the loops below index single samples and multiply them together;
+    # plain Python ints are faster to index than numpy scalars and, unlike
+    # an int32 window, cannot overflow in nume / denom
+    ir_data = np.asarray(ir_data).tolist()
+    red_data = np.asarray(red_data).tolist()
+
     i_ratio_count = 0
     ratio = []
 
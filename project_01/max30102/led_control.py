@@ -0,0 +1,110 @@
+# -*-coding:utf-8
+
+from max30102 import ADC_FULL_SCALE
+
+
+class _Channel(object):
+
+    def __init__(self, pa):
+        self.pa = pa
+        # rolling DC level and the number of samples in it
+        self.level = None
+        self.samples = 0
+        self.saturated = False
+        self.changed_at = None
+
+    def reset(self):
+        self.level = None
+        self.samples = 0
+        self.saturated = False
+
+
+class LedCurrentControl(object):
+    """
+    Keeps the DC level of the red and IR signals inside [`low`, `high`]
+    ADC counts by adjusting the LED pulse amplitudes.
+
+    The level of each channel is an exponential average over about `span`
+    samples. Inside the band nothing happens; outside it the amplitude is
+    scaled so that the level would land on `target`, by at most `max_step`
+    register units at a time. After a change the level is measured afresh
+    and the next change waits at least `settle` seconds, which keeps
+    amplitude steps out of most calculation windows. A sample at full scale
+    means the ADC clips, which counts as too high whatever the average.
+    Levels below `min_level` mean nothing is on the sensor and are left
+    alone, otherwise the LEDs would be driven to full current for nothing.
+    """
+
+    def __init__(self, red_pa, ir_pa, low=80000, high=200000, target=130000,
+                 min_level=10000, span=25, settle=2.0, max_step=0x20,
+                 min_pa=0x01, max_pa=0xff):
+        if not low < target < high:
+            raise ValueError("target must be between low and high")
+        self.low = low
+        self.high = high
+        self.target = target
+        self.min_level = min_level
+        self.span = span
+        self.settle = settle
+        self.max_step = max_step
+        self.min_pa = min_pa
+        self.max_pa = max_pa
+        self.adjustments = 0
+        self._red = _Channel(red_pa)
+        self._ir = _Channel(ir_pa)
+
+    def update(self, now, red, ir):
+        """
+        Add one block of samples read at time `now`. Returns the
+        (red, ir) amplitudes the LEDs should run at.
+        """
+        self._update(self._red, now, red)
+        self._update(self._ir, now, ir)
+        return self._red.pa, self._ir.pa
+
+    def _update(self, channel, now, block):
+        n = len(block)
+        if n == 0:
+            return
+        mean = float(block.mean())
+        if channel.level is None:
+            channel.level = mean
+        else:
+            weight = 1.0 - (1.0 - 1.0 / self.span) ** n
+            channel.level += weight * (mean - channel.level)
+        channel.samples += n
+        channel.saturated = channel.saturated or block.max() >= ADC_FULL_SCALE
+
+        if channel.samples < self.span:
+            return
+        if channel.changed_at is not None and now - channel.changed_at < self.settle:
+            return
+        level = ADC_FULL_SCALE if channel.saturated else channel.level
+        if level < self.min_level or self.low <= level <= self.high:
+            channel.saturated = False
+            return
+
+        pa = int(round(channel.pa * float(self.target) / level))
+        pa = max(channel.pa - self.max_step, min(channel.pa + self.max_step, pa))
+        pa = max(self.min_pa, min(self.max_pa, pa))
+        channel.reset()
+        if pa != channel.pa:
+            channel.pa = pa
+            channel.changed_at = now
+            self.adjustments += 1
+
+    def reset(self):
+        """
+        Forget the measured levels, e.g. after the sensor was idle. The
+        amplitudes are kept.
+        """
+        self._red.reset()
+        self._ir.reset()
+
+    @property
+    def red_pa(self):
+        return self._red.pa
+
+    @property
+    def ir_pa(self):
+        return self._ir.pa
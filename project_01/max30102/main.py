@@ -1,21 +1,36 @@
 from heartrate_monitor import HeartRateMonitor
+from output import OutputSink, FORMATS, FORMAT_TEXT
 import time
 import argparse
+import sys
 
 parser = argparse.ArgumentParser(description="Read and print data from MAX30102")
 parser.add_argument("-r", "--raw", action="store_true",
                     help="print raw data instead of calculation result")
 parser.add_argument("-t", "--time", type=int, default=30,
                     help="duration in seconds to read from sensor, default 30")
+parser.add_argument("-o", "--record", metavar="FILE", default=None,
+                    help="also record raw samples to FILE in binary format")
+parser.add_argument("-f", "--format", choices=FORMATS, default=FORMAT_TEXT,
+                    help="output format, default text")
 args = parser.parse_args()
 
-print('sensor starting...')
-hrm = HeartRateMonitor(print_raw=args.raw, print_result=(not args.raw))
+# keep status messages out of machine readable output
+status = sys.stdout if args.format == FORMAT_TEXT else sys.stderr
+
+print('sensor starting...', file=status)
+output = None
+if args.format != FORMAT_TEXT:
+    output = OutputSink(fmt=args.format)
+hrm = HeartRateMonitor(print_raw=args.raw, print_result=(not args.raw),
+                       record_path=args.record, output=output)
 hrm.start_sensor()
 try:
     time.sleep(args.time)
 except KeyboardInterrupt:
-    print('keyboard interrupt detected, exiting...')
+    print('keyboard interrupt detected, exiting...', file=status)
 
 hrm.stop_sensor()
-print('sensor stoped!')
\ No newline at end of file
+if output is not None:
+    output.close()
+print('sensor stoped!', file=status)
\ No newline at end of file
@@ -3,7 +3,11 @@
 # this code is currently for python 2.7
 from __future__ import print_function
 from time import sleep
-import smbus
+try:
+    import smbus
+except ImportError:
+    # lets the rest of the package (e.g. replay.py) run off-device
+    smbus = None
 
 # register addresses
 REG_INTR_STATUS_1 = 0x00
@@ -34,6 +38,27 @@ REG_PROX_INT_THRESH = 0x30
 REG_REV_ID = 0xFE
 REG_PART_ID = 0xFF
 
+FIFO_DEPTH = 32
+# largest value of the 18-bit ADC
+ADC_FULL_SCALE = 0x3FFFF
+
+# REG_INTR_STATUS_1 / REG_INTR_ENABLE_1 bits
+INTR_A_FULL = 0x80
+INTR_PPG_RDY = 0x40
+INTR_ALC_OVF = 0x20
+INTR_PROX = 0x10
+
+# REG_PROX_INT_THRESH is compared with the 8 MSBs of the 18-bit IR value;
+# this matches the 50000 count finger check of HeartRateMonitor
+PROX_THRESHOLD = 50000 >> 10
+# ~7mA, the same as LED1 / LED2, so that the threshold means the same
+PROX_PILOT_PA = 0x24
+
+# REG_SPO2_CONFIG SPO2_SR[4:2] -> samples per second
+SPO2_SAMPLE_RATES = [50, 100, 200, 400, 800, 1000, 1600, 3200]
+# REG_FIFO_CONFIG SMP_AVE[7:5] -> number of samples averaged per FIFO entry
+FIFO_SAMPLE_AVERAGES = [1, 2, 4, 8, 16, 32, 32, 32]
+
 
 class MAX30102():
     # by default, this assumes that the device is at 0x57 on channel 1
@@ -41,6 +66,16 @@ class MAX30102():
         #print("Channel: {0}, address: {1}".format(channel, address))
         self.address = address
         self.channel = channel
+        # last values written to the registers that set the sample rate
+        self.fifo_config = 0x00
+        self.spo2_config = 0x00
+        self.intr_enable_1 = 0x00
+        self.led_mode = 0x03
+        # LED1 (red) / LED2 (IR) pulse amplitudes
+        self.red_pa = 0x00
+        self.ir_pa = 0x00
+        if smbus is None:
+            raise ImportError("The smbus module is required to talk to the MAX30102")
         self.bus = smbus.SMBus(self.channel)
 
         self.reset()
@@ -74,6 +109,7 @@ class MAX30102():
         # 0xc0 : A_FULL_EN and PPG_RDY_EN = Interrupt will be triggered when
         # fifo almost full & new fifo data ready
         self.bus.write_i2c_block_data(self.address, REG_INTR_ENABLE_1, [0xc0])
+        self.intr_enable_1 = 0xc0
         self.bus.write_i2c_block_data(self.address, REG_INTR_ENABLE_2, [0x00])
 
         # FIFO_WR_PTR[4:0]
@@ -86,17 +122,22 @@ class MAX30102():
         # 0b 0100 1111
         # sample avg = 4, fifo rollover = false, fifo almost full = 17
         self.bus.write_i2c_block_data(self.address, REG_FIFO_CONFIG, [0x4f])
+        self.fifo_config = 0x4f
 
         # 0x02 for read-only, 0x03 for SpO2 mode, 0x07 multimode LED
         self.bus.write_i2c_block_data(self.address, REG_MODE_CONFIG, [led_mode])
+        self.led_mode = led_mode
         # 0b 0010 0111
         # SPO2_ADC range = 4096nA, SPO2 sample rate = 100Hz, LED pulse-width = 411uS
         self.bus.write_i2c_block_data(self.address, REG_SPO2_CONFIG, [0x27])
+        self.spo2_config = 0x27
 
         # choose value for ~7mA for LED1
         self.bus.write_i2c_block_data(self.address, REG_LED1_PA, [0x24])
+        self.red_pa = 0x24
         # choose value for ~7mA for LED2
         self.bus.write_i2c_block_data(self.address, REG_LED2_PA, [0x24])
+        self.ir_pa = 0x24
         # choose value fro ~25mA for Pilot LED
         self.bus.write_i2c_block_data(self.address, REG_PILOT_PA, [0x7f])
 
@@ -104,6 +145,40 @@ class MAX30102():
     # use when changing the values from default
     def set_config(self, reg, value):
         self.bus.write_i2c_block_data(self.address, reg, value)
+        if reg == REG_FIFO_CONFIG:
+            self.fifo_config = value[0]
+        elif reg == REG_SPO2_CONFIG:
+            self.spo2_config = value[0]
+        elif reg == REG_INTR_ENABLE_1:
+            self.intr_enable_1 = value[0]
+        elif reg == REG_MODE_CONFIG:
+            self.led_mode = value[0]
+        elif reg == REG_LED1_PA:
+            self.red_pa = value[0]
+        elif reg == REG_LED2_PA:
+            self.ir_pa = value[0]
+
+    def set_led_amplitudes(self, red_pa, ir_pa):
+        """
+        Set the red (LED1) and IR (LED2) pulse amplitudes, 0x00 - 0xFF in
+        steps of ~0.2mA. Registers that already hold the value are not
+        written again.
+        """
+        if red_pa != self.red_pa:
+            self.bus.write_i2c_block_data(self.address, REG_LED1_PA, [red_pa])
+            self.red_pa = red_pa
+        if ir_pa != self.ir_pa:
+            self.bus.write_i2c_block_data(self.address, REG_LED2_PA, [ir_pa])
+            self.ir_pa = ir_pa
+
+    def effective_sample_rate(self):
+        """
+        Number of FIFO entries produced per second with the current
+        configuration (ADC sample rate / sample averaging).
+        """
+        rate = SPO2_SAMPLE_RATES[(self.spo2_config >> 2) & 0x07]
+        average = FIFO_SAMPLE_AVERAGES[(self.fifo_config >> 5) & 0x07]
+        return float(rate) / average
 
     def get_data_present(self):
         read_ptr = self.bus.read_byte_data(self.address, REG_FIFO_RD_PTR)
@@ -114,9 +189,59 @@ class MAX30102():
             num_samples = write_ptr - read_ptr
             # account for pointer wrap around
             if num_samples < 0:
-                num_samples += 32
+                num_samples += FIFO_DEPTH
             return num_samples
 
+    def get_overflow_count(self):
+        """
+        Number of samples lost because the FIFO was full (OVF_COUNTER,
+        saturates at 31, cleared by the next FIFO read). With FIFO
+        rollover off a full FIFO has equal read and write pointers, so
+        get_data_present() returns 0 for it; a non-zero count tells it
+        apart from an empty FIFO.
+        """
+        return self.bus.read_byte_data(self.address, REG_OVF_COUNTER) & 0x1F
+
+    def clear_fifo(self):
+        self.bus.write_i2c_block_data(self.address, REG_FIFO_WR_PTR, [0x00])
+        self.bus.write_i2c_block_data(self.address, REG_OVF_COUNTER, [0x00])
+        self.bus.write_i2c_block_data(self.address, REG_FIFO_RD_PTR, [0x00])
+
+    def enter_proximity_mode(self, threshold=PROX_THRESHOLD, pilot_pa=PROX_PILOT_PA):
+        """
+        Park the device in proximity mode: only the IR LED is pulsed, at
+        the pilot current, until the IR value crosses `threshold` (see
+        PROX_THRESHOLD). The device then returns to the normal mode by
+        itself and sets PROX_INT, see proximity_triggered().
+        """
+        self.bus.write_i2c_block_data(self.address, REG_PILOT_PA, [pilot_pa])
+        self.bus.write_i2c_block_data(self.address, REG_PROX_INT_THRESH, [threshold])
+        # clear a stale PROX_INT before arming it
+        self.bus.read_i2c_block_data(self.address, REG_INTR_STATUS_1, 1)
+        self.intr_enable_1 |= INTR_PROX
+        self.bus.write_i2c_block_data(self.address, REG_INTR_ENABLE_1, [self.intr_enable_1])
+        # writing the mode restarts the measurement, now in proximity mode
+        self.bus.write_i2c_block_data(self.address, REG_MODE_CONFIG, [self.led_mode])
+        self.clear_fifo()
+
+    def proximity_triggered(self):
+        """
+        Read (and clear) the interrupt status and return True if PROX_INT
+        was set, i.e. something is on the sensor. One I2C read, so it is
+        cheap enough to poll while idle.
+        """
+        reg_INTR1 = self.bus.read_i2c_block_data(self.address, REG_INTR_STATUS_1, 1)
+        return bool(reg_INTR1[0] & INTR_PROX)
+
+    def exit_proximity_mode(self):
+        """
+        Disarm the proximity interrupt and drop whatever the FIFO holds,
+        so that sampling continues from a clean FIFO in the normal mode.
+        """
+        self.intr_enable_1 &= ~INTR_PROX & 0xff
+        self.bus.write_i2c_block_data(self.address, REG_INTR_ENABLE_1, [self.intr_enable_1])
+        self.clear_fifo()
+
     def read_fifo(self):
         """
         This function will read the data register.
@@ -0,0 +1,146 @@
+# -*-coding:utf-8
+
+from bisect import bisect_left
+import time
+
+# latency histogram bucket upper bounds in seconds: 10 us, 20 us, ... ~5 s
+LATENCY_BOUNDS = [1e-5 * 2 ** k for k in range(20)]
+# samples drained per wakeup: one bucket per possible FIFO fill level
+DRAIN_BOUNDS = list(range(33))
+
+
+class Histogram(object):
+    """
+    Fixed-bucket histogram; `add` is a bisect and two increments.
+    Values above the last bound go into an overflow bucket.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding the given fraction of values
+        (the exact maximum for the overflow bucket).
+        """
+        if self.count == 0:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'buckets': list(zip(self.bounds + [float('inf')], self.counts)),
+        }
+
+
+class Metrics(object):
+    """
+    Per-stage latency histograms, value histograms and counters.
+
+    Time a stage with
+
+        start = metrics.time()
+        ...
+        metrics.observe('stage', start)
+
+    Each histogram / counter should only be updated from one thread. Updates
+    are not locked, so a snapshot of a running monitor may be off by the
+    event in flight.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def time(self):
+        return time.perf_counter()
+
+    def observe(self, stage, start):
+        """
+        Record the time since `start` (from `time()`) for `stage`.
+        """
+        elapsed = time.perf_counter() - start
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = Histogram(LATENCY_BOUNDS)
+        hist.add(elapsed)
+
+    def value(self, name, value, bounds=DRAIN_BOUNDS):
+        """
+        Record a value (not a duration) into the histogram `name`.
+        """
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(bounds)
+        hist.add(value)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        """
+        Return plain dicts / lists that can be serialised as they are.
+        """
+        return {
+            'enabled': self.enabled,
+            'counters': dict(self.counters),
+            'histograms': dict((name, hist.snapshot())
+                               for name, hist in list(self.histograms.items())),
+        }
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+
+
+class NullMetrics(Metrics):
+    """
+    Metrics that records nothing, used when instrumentation is disabled.
+    """
+
+    enabled = False
+
+    def time(self):
+        return 0.0
+
+    def observe(self, stage, start):
+        pass
+
+    def value(self, name, value, bounds=DRAIN_BOUNDS):
+        pass
+
+    def count(self, name, n=1):
+        pass
@@ -0,0 +1,179 @@
+# -*-coding:utf-8
+
+from collections import deque
+import math
+import struct
+import sys
+import threading
+
+import numpy as np
+
+from subscription import QUALITY_NO_FINGER
+
+# output formats
+#   text:   the human readable lines main.py has always printed
+#   csv:    "raw,<timestamp>,<ir>,<red>" and
+#           "result,<timestamp>,<bpm>,<spo2>,<quality>" rows
+#   binary: little endian records starting with a type byte, see below
+FORMAT_TEXT = 'text'
+FORMAT_CSV = 'csv'
+FORMAT_BINARY = 'binary'
+
+FORMATS = (FORMAT_TEXT, FORMAT_CSV, FORMAT_BINARY)
+
+RECORD_RAW = 1
+RECORD_RESULT = 2
+
+# binary raw sample: type, sample time, ir, red
+RAW_DTYPE = np.dtype([('type', 'u1'), ('timestamp', '<f8'),
+                      ('ir', '<u4'), ('red', '<u4')])
+# binary result: type, timestamp, bpm, spo2 (NaN if unknown), quality
+RESULT_FORMAT = '<Bdffb'
+
+
+class OutputSink(object):
+    """
+    Batched, non-blocking writer for raw samples and results.
+
+    `write_raw` and `write_result` only append to an in-memory batch; a
+    background thread formats the batch and writes it to `stream` once
+    `batch_size` records are pending or `flush_interval` seconds have
+    passed. If more than `max_pending` records are waiting (the stream is
+    too slow) new records are dropped and counted instead of blocking the
+    caller.
+    """
+
+    def __init__(self, stream=None, fmt=FORMAT_TEXT, batch_size=256,
+                 flush_interval=0.5, max_pending=8192):
+        if fmt not in FORMATS:
+            raise ValueError("Unknown output format: {0}".format(fmt))
+        if stream is None:
+            stream = sys.stdout.buffer if fmt == FORMAT_BINARY else sys.stdout
+        self.stream = stream
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        # entries are (RECORD_RAW, timestamp, ir array, red array) or
+        # (RECORD_RESULT, reading)
+        self._entries = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_pending_seen = 0
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _add(self, entry, records):
+        with self._cond:
+            if self._closed or self._pending + records > self.max_pending:
+                self.dropped += records
+                return False
+            self._entries.append(entry)
+            self._pending += records
+            self.max_pending_seen = max(self.max_pending_seen, self._pending)
+            if self._pending >= self.batch_size:
+                self._cond.notify()
+            return True
+
+    def write_raw(self, timestamp, ir, red):
+        """
+        Queue one block of raw samples. `timestamp` is one time for the
+        block or an array with one time per sample. Never blocks.
+        """
+        return self._add((RECORD_RAW, timestamp, ir, red), len(ir))
+
+    def write_result(self, reading):
+        """
+        Queue one Reading. Never blocks.
+        """
+        return self._add((RECORD_RESULT, reading), 1)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._pending < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                entries = self._entries
+                records = self._pending
+                self._entries = deque()
+                self._pending = 0
+                closed = self._closed
+            if entries:
+                try:
+                    self._write(entries)
+                    self.written += records
+                    self.batches += 1
+                except (OSError, ValueError):
+                    # e.g. a closed pipe; there is nobody to report to
+                    self.dropped += records
+            if closed:
+                break
+
+    def _write(self, entries):
+        if self.fmt == FORMAT_BINARY:
+            data = b''.join(self._format_binary(entry) for entry in entries)
+        else:
+            data = ''.join(self._format_text(entry) for entry in entries)
+        self.stream.write(data)
+        self.stream.flush()
+
+    def _format_text(self, entry):
+        if entry[0] == RECORD_RAW:
+            _, timestamp, ir, red = entry
+            if self.fmt == FORMAT_CSV:
+                times = np.broadcast_to(timestamp, ir.shape).tolist()
+                return ''.join("raw,{0:.6f},{1},{2}\n".format(t, i, r)
+                               for t, i, r in zip(times, ir.tolist(), red.tolist()))
+            return ''.join("{0}, {1}\n".format(i, r)
+                           for i, r in zip(ir.tolist(), red.tolist()))
+
+        reading = entry[1]
+        if self.fmt == FORMAT_CSV:
+            return "result,{0:.6f},{1},{2},{3}\n".format(
+                reading.timestamp, reading.bpm,
+                '' if reading.spo2 is None else reading.spo2, reading.quality)
+        line = "BPM: {0}, SpO2: {1}\n".format(reading.bpm, reading.spo2)
+        if reading.quality == QUALITY_NO_FINGER:
+            line = "Finger not detected\n" + line
+        return line
+
+    def _format_binary(self, entry):
+        if entry[0] == RECORD_RAW:
+            _, timestamp, ir, red = entry
+            records = np.empty(len(ir), dtype=RAW_DTYPE)
+            records['type'] = RECORD_RAW
+            records['timestamp'] = timestamp
+            records['ir'] = ir
+            records['red'] = red
+            return records.tobytes()
+
+        reading = entry[1]
+        spo2 = math.nan if reading.spo2 is None else reading.spo2
+        return struct.pack(RESULT_FORMAT, RECORD_RESULT, reading.timestamp,
+                           reading.bpm, spo2, reading.quality)
+
+    def stats(self):
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'pending': self._pending,
+            'max_pending': self.max_pending_seen,
+        }
+
+    def close(self, timeout=2.0):
+        """
+        Write what is still pending and stop the writer thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
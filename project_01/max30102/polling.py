@@ -0,0 +1,56 @@
+# -*-coding:utf-8
+
+from max30102 import FIFO_DEPTH
+
+
+class AdaptivePoller(object):
+    """
+    Decides how long the acquisition loop may sleep between FIFO drains.
+
+    The sample rate is estimated from the number of samples found at each
+    wakeup, starting from the programmed rate. The poller sleeps until the
+    FIFO is predicted to hold `target_fill` samples. The sleep is also
+    capped so that even at the higher of the programmed and the estimated
+    rate (plus `rate_margin`) the FIFO stays `headroom` entries short of
+    full. A full FIFO drops new samples and, with equal read / write
+    pointers, looks empty to get_data_present.
+    """
+
+    def __init__(self, sample_rate, target_fill=16, headroom=6,
+                 min_interval=0.005, rate_margin=0.1, smoothing=0.2):
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be positive")
+        if not 1 <= target_fill <= FIFO_DEPTH - headroom:
+            raise ValueError("target_fill must be between 1 and {0}".format(FIFO_DEPTH - headroom))
+        self.programmed_rate = float(sample_rate)
+        self.rate = float(sample_rate)
+        self.target_fill = target_fill
+        self.headroom = headroom
+        self.min_interval = min_interval
+        self.rate_margin = rate_margin
+        self.smoothing = smoothing
+        self._last_drain = None
+
+    def update(self, now, drained):
+        """
+        Record that `drained` samples were read at time `now`, leaving the
+        FIFO empty. Returns the number of seconds to sleep before the next
+        drain.
+        """
+        if self._last_drain is not None and drained > 0:
+            elapsed = now - self._last_drain
+            if elapsed > 0:
+                observed = drained / elapsed
+                # ignore wildly implausible values (e.g. after a stall)
+                if 0.5 * self.programmed_rate < observed < 2.0 * self.programmed_rate:
+                    self.rate += self.smoothing * (observed - self.rate)
+        if drained > 0 or self._last_drain is None:
+            self._last_drain = now
+
+        # samples that may already have arrived since the last drain
+        fill = (now - self._last_drain) * self.rate
+        delay = (self.target_fill - fill) / self.rate
+
+        fastest = max(self.rate, self.programmed_rate) * (1.0 + self.rate_margin)
+        limit = (FIFO_DEPTH - self.headroom - fill) / fastest
+        return max(self.min_interval, min(delay, limit))
@@ -0,0 +1,169 @@
+# -*-coding:utf-8
+
+import mmap
+import struct
+import time
+
+import numpy as np
+
+# File layout:
+#   header  (HEADER_SIZE bytes, little endian)
+#     magic        8s   b'PPGREC01'
+#     version      H
+#     header_size  H
+#     record_size  H
+#     reserved     H
+#     sample_rate  d    nominal samples per second
+#     start_time   d    time.time() when the recording was opened
+#   records (record_size bytes each, RECORD_DTYPE) until the end of the file
+MAGIC = b'PPGREC01'
+VERSION = 1
+HEADER_FORMAT = '<8sHHHHdd'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'),  # time.monotonic() of the sample
+                         ('red', '<u4'),
+                         ('ir', '<u4'),
+                         ('flags', '<u4')])
+
+# first sample of a FIFO drain
+FLAG_BLOCK_START = 0x01
+# the FIFO was full before this drain and samples were lost (the sensor's
+# OVF_COUNTER was non-zero)
+FLAG_FIFO_FULL = 0x02
+
+
+class PPGRecorder(object):
+    """
+    Append-only writer for raw red / ir samples.
+
+    Samples are copied into a preallocated chunk of records and written to
+    the file one whole chunk at a time, so recording a FIFO drain costs a
+    couple of array copies rather than a write per sample.
+    """
+
+    def __init__(self, path, sample_rate=25, chunk_records=4096):
+        self.path = path
+        self.records = 0
+        self._chunk = np.zeros(chunk_records, dtype=RECORD_DTYPE)
+        self._fill = 0
+        self._file = open(path, 'wb')
+        self._file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, HEADER_SIZE,
+                                     RECORD_DTYPE.itemsize, 0,
+                                     float(sample_rate), time.time()))
+
+    def write_block(self, timestamp, red, ir, overflow=0):
+        """
+        Record one FIFO drain. `timestamp` is either one time for the whole
+        block or an array with one time per sample. `overflow` is the
+        number of samples lost before the drain (see SampleBlock).
+        """
+        n = len(ir)
+        if n == 0:
+            return
+        flags = np.zeros(n, dtype=np.uint32)
+        flags[0] = FLAG_BLOCK_START
+        if overflow:
+            flags[0] |= FLAG_FIFO_FULL
+
+        start = 0
+        while start < n:
+            count = min(n - start, len(self._chunk) - self._fill)
+            dest = self._chunk[self._fill:self._fill + count]
+            src = slice(start, start + count)
+            dest['timestamp'] = timestamp if np.isscalar(timestamp) else timestamp[src]
+            dest['red'] = red[src]
+            dest['ir'] = ir[src]
+            dest['flags'] = flags[src]
+            self._fill += count
+            start += count
+            if self._fill == len(self._chunk):
+                self.flush()
+        self.records += n
+
+    def flush(self):
+        """
+        Write the buffered records to the file.
+        """
+        if self._fill:
+            self._file.write(memoryview(self._chunk[:self._fill]).cast('B'))
+            self._fill = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PPGRecording(object):
+    """
+    Read-only view of a file written by PPGRecorder.
+
+    The file is memory mapped and `timestamp`, `red`, `ir` and `flags` are
+    numpy views straight into the mapping, so opening even a multi-hour
+    capture does not read or copy the samples. A partially written last
+    record (e.g. after a crash) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER_SIZE:
+            self._mmap.close()
+            raise ValueError("{0} is not a PPG recording".format(path))
+        (magic, version, header_size, record_size, _,
+         self.sample_rate, self.start_time) = struct.unpack_from(HEADER_FORMAT, self._mmap)
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            self._mmap.close()
+            raise ValueError("{0} is not a PPG recording".format(path))
+        self.version = version
+
+        count = (len(self._mmap) - header_size) // record_size
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE,
+                                     count=count, offset=header_size)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamp(self):
+        return self.records['timestamp']
+
+    @property
+    def red(self):
+        return self.records['red']
+
+    @property
+    def ir(self):
+        return self.records['ir']
+
+    @property
+    def flags(self):
+        return self.records['flags']
+
+    def close(self):
+        """
+        Unmap the file. If arrays taken from this recording are still
+        alive the mapping stays open until they are garbage collected.
+        """
+        self.records = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
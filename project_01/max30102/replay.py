@@ -0,0 +1,175 @@
+# -*-coding:utf-8
+
+from recorder import PPGRecording
+from clock import VirtualClock
+from block_queue import POLICY_WAIT
+from heartrate_monitor import HeartRateMonitor
+from max30102 import PROX_THRESHOLD, ADC_FULL_SCALE, FIFO_DEPTH
+import threading
+import time
+import argparse
+
+# LED amplitude setup() programs, assumed for every recording
+RECORDED_PA = 0x24
+
+
+class ReplaySensor(object):
+    """
+    Stands in for MAX30102 and plays back a PPGRecording.
+
+    Each recorded sample becomes readable once `clock` reaches its recorded
+    time, relative to the start of the recording. `transactions` counts the
+    I2C transactions the MAX30102 driver would have made for the same calls.
+
+    Changing the LED amplitudes scales the recorded values accordingly, as
+    if the signal were proportional to the LED current, and clips them to
+    the ADC range.
+    """
+
+    def __init__(self, recording, clock):
+        self.recording = recording
+        self.clock = clock
+        # plain lists index faster than the memory-mapped arrays
+        self._red = recording.red.tolist()
+        self._ir = recording.ir.tolist()
+        # availability time of every sample on the replay clock
+        self._times = (recording.timestamp - recording.timestamp[0] + clock.now()
+                       if len(recording) else recording.timestamp)
+        self._next = 0
+        # times a real FIFO would have overflowed (samples are not dropped)
+        self.overflows = 0
+        self.transactions = 0
+        self._prox_threshold = None
+        self.red_pa = RECORDED_PA
+        self.ir_pa = RECORDED_PA
+        self.finished = threading.Event()
+        if len(recording) == 0:
+            self.finished.set()
+
+    def _available(self):
+        return int(self._times.searchsorted(self.clock.now(), side='right'))
+
+    def get_data_present(self):
+        # samples whose time has come; like the sensor, a full FIFO has
+        # equal pointers and reads as empty (see get_overflow_count)
+        self.transactions += 2
+        pending = self._available() - self._next
+        if pending > FIFO_DEPTH:
+            self.overflows += 1
+        if pending >= FIFO_DEPTH:
+            return 0
+        return pending
+
+    def get_overflow_count(self):
+        # samples past a full FIFO (they are still replayed, not dropped)
+        self.transactions += 1
+        return min(max(self._available() - self._next - FIFO_DEPTH, 0), 0x1F)
+
+    def effective_sample_rate(self):
+        return self.recording.sample_rate
+
+    def read_fifo(self):
+        self.transactions += 3
+        i = self._next
+        self._next += 1
+        if self._next == len(self._ir):
+            self.finished.set()
+        red = self._red[i] * self.red_pa // RECORDED_PA
+        ir = self._ir[i] * self.ir_pa // RECORDED_PA
+        return min(red, ADC_FULL_SCALE), min(ir, ADC_FULL_SCALE)
+
+    def set_led_amplitudes(self, red_pa, ir_pa):
+        self.transactions += (red_pa != self.red_pa) + (ir_pa != self.ir_pa)
+        self.red_pa = red_pa
+        self.ir_pa = ir_pa
+
+    def enter_proximity_mode(self, threshold=PROX_THRESHOLD, pilot_pa=None):
+        self.transactions += 8
+        self._prox_threshold = threshold
+
+    def proximity_triggered(self):
+        # the samples recorded while parked are never sampled for real;
+        # skip them and trigger on the newest one, like the sensor would
+        self.transactions += 1
+        available = self._available()
+        if available <= self._next:
+            return False
+        self._next = available
+        if self._next == len(self._ir):
+            self.finished.set()
+        return (self._ir[available - 1] >> 10) > self._prox_threshold
+
+    def exit_proximity_mode(self):
+        self.transactions += 4
+        self._prox_threshold = None
+
+    def shutdown(self):
+        pass
+
+
+def replay(path, speed=None, **kwargs):
+    """
+    Run a recording through HeartRateMonitor and return a dict with the
+    published readings, the pipeline stats and the replay throughput.
+
+    `speed=None` replays as fast as possible, otherwise `speed` times the
+    original pace. Remaining keyword arguments go to HeartRateMonitor.
+    """
+    recording = PPGRecording(path)
+    clock = VirtualClock(speed=speed)
+    kwargs.setdefault('queue_policy', POLICY_WAIT)
+    sensors = []
+
+    def sensor_factory():
+        sensors.append(ReplaySensor(recording, clock))
+        return sensors[-1]
+
+    hrm = HeartRateMonitor(sensor_factory=sensor_factory, clock=clock, **kwargs)
+    readings = []
+    hrm.add_callback(readings.append)
+
+    start = time.monotonic()
+    hrm.start_sensor()
+    # wait for the end of the recording, unless the acquisition thread
+    # dies first (e.g. an exception in the pipeline)
+    while not (sensors and sensors[0].finished.wait(0.05)):
+        if not hrm._thread.is_alive():
+            hrm.stop_sensor()
+            raise RuntimeError("Acquisition stopped before the end of the recording")
+        if not sensors:
+            time.sleep(0.001)
+    hrm.stop_sensor()
+    elapsed = time.monotonic() - start
+
+    stats = {
+        'samples': len(recording),
+        'recorded_seconds': (float(recording.timestamp[-1] - recording.timestamp[0])
+                             if len(recording) else 0.0),
+        'wall_seconds': elapsed,
+        'samples_per_second': len(recording) / elapsed if elapsed > 0 else 0.0,
+        'readings': readings,
+        'pipeline': hrm.get_pipeline_stats(),
+        'overflows': sensors[0].overflows,
+        'transactions': sensors[0].transactions,
+    }
+    recording.close()
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a recorded MAX30102 session")
+    parser.add_argument("file", help="recording written with main.py -o")
+    parser.add_argument("-s", "--speed", type=float, default=None,
+                        help="replay speed relative to real time, default as fast as possible")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print the throughput summary")
+    args = parser.parse_args()
+
+    result = replay(args.file, speed=args.speed)
+    if not args.quiet:
+        for reading in result['readings']:
+            print("{0:.3f}: BPM: {1}, SpO2: {2}".format(reading.timestamp, reading.bpm, reading.spo2))
+    print("{0} samples ({1:.1f} s recorded) in {2:.2f} s: {3:.0f} samples/s, {4:.1f}x real time".format(
+        result['samples'], result['recorded_seconds'], result['wall_seconds'],
+        result['samples_per_second'],
+        result['recorded_seconds'] / result['wall_seconds'] if result['wall_seconds'] > 0 else 0.0))
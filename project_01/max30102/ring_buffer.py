@@ -0,0 +1,87 @@
+# -*-coding:utf-8
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """
+    A fixed-capacity FIFO of samples backed by preallocated numpy storage.
+
+    Every sample is written twice, at `i` and `i + capacity`, so the newest
+    `n` samples always sit in one contiguous slice of the storage. That lets
+    `latest()` hand out a zero-copy view instead of stitching the two halves
+    of the ring back together on every read.
+    """
+
+    def __init__(self, capacity, dtype=np.int32):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros(2 * capacity, dtype=self.dtype)
+        # index of the slot the next sample will be written to
+        self._head = 0
+        self._count = 0
+        # total number of samples ever appended
+        self.total = 0
+
+    def __len__(self):
+        return self._count
+
+    def is_full(self):
+        return self._count == self.capacity
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def append(self, value):
+        """
+        Append a single sample, evicting the oldest one when full.
+        """
+        head = self._head
+        self._data[head] = value
+        self._data[head + self.capacity] = value
+        self._head = (head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, values):
+        """
+        Append a block of samples (e.g. one FIFO drain) in bulk.
+        Only the last `capacity` samples of an oversized block are kept.
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        n = values.shape[0]
+        if n == 0:
+            return
+        self.total += n
+        if n > self.capacity:
+            values = values[-self.capacity:]
+            n = self.capacity
+
+        head = self._head
+        first = min(n, self.capacity - head)
+        # copy into the primary half and its mirror
+        self._data[head:head + first] = values[:first]
+        self._data[head + self.capacity:head + self.capacity + first] = values[:first]
+        if first < n:
+            rest = n - first
+            self._data[:rest] = values[first:]
+            self._data[self.capacity:self.capacity + rest] = values[first:]
+
+        self._head = (head + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+
+    def latest(self, n=None):
+        """
+        Return a read-only, contiguous view of the newest `n` samples
+        (all buffered samples by default), oldest first. The view is only
+        valid until the next append.
+        """
+        if n is None or n > self._count:
+            n = self._count
+        end = self._head + self.capacity
+        view = self._data[end - n:end]
+        view.flags.writeable = False
+        return view
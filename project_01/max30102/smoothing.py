@@ -0,0 +1,170 @@
+# -*-coding:utf-8
+
+from bisect import bisect_left, insort
+from collections import deque
+
+# how BpmSmoother combines the recent values
+#   mean:   average of the last `horizon` values
+#   median: median of the last `horizon` values
+#   ema:    exponential moving average with a span of `horizon` values
+SMOOTH_MEAN = 'mean'
+SMOOTH_MEDIAN = 'median'
+SMOOTH_EMA = 'ema'
+
+SMOOTHING_METHODS = (SMOOTH_MEAN, SMOOTH_MEDIAN, SMOOTH_EMA)
+
+# scales the median absolute deviation to a standard deviation
+MAD_SCALE = 1.4826
+
+
+class RollingWindow(object):
+    """
+    The last `size` values with their running sum, so the mean costs the
+    same whatever the size and append() is O(1). With `ordered=True` a
+    sorted copy is kept as well, for the median: append() then costs a
+    binary search plus an O(size) list shift, which is cheap for the few
+    values smoothed here. Without it median() sorts the window on every
+    call.
+    """
+
+    def __init__(self, size, ordered=False):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self._values = deque()
+        self._sorted = [] if ordered else None
+        self._sum = 0.0
+
+    def __len__(self):
+        return len(self._values)
+
+    def append(self, value):
+        ordered = self._sorted
+        if len(self._values) == self.size:
+            old = self._values.popleft()
+            if ordered is not None:
+                del ordered[bisect_left(ordered, old)]
+            self._sum -= old
+        self._values.append(value)
+        if ordered is not None:
+            insort(ordered, value)
+        self._sum += value
+
+    def mean(self):
+        return self._sum / len(self._values)
+
+    def _ordered(self):
+        if self._sorted is not None:
+            return self._sorted
+        return sorted(self._values)
+
+    def median(self):
+        s = self._ordered()
+        n = len(s)
+        if n % 2:
+            return s[n // 2]
+        return 0.5 * (s[n // 2 - 1] + s[n // 2])
+
+    def mad(self):
+        """
+        Median absolute deviation from the median; this one does walk the
+        window, which is fine for the few values it is used on.
+        """
+        median = self.median()
+        deviations = sorted(abs(v - median) for v in self._values)
+        n = len(deviations)
+        if n % 2:
+            return deviations[n // 2]
+        return 0.5 * (deviations[n // 2 - 1] + deviations[n // 2])
+
+    def clear(self):
+        self._values.clear()
+        if self._sorted is not None:
+            del self._sorted[:]
+        self._sum = 0.0
+
+
+class BpmSmoother(object):
+    """
+    Turns the BPM of successive windows into the reported value.
+
+    `method` is one of SMOOTHING_METHODS, over the last `horizon` values.
+    With `outlier_threshold` set, a value further than that many (MAD
+    based) standard deviations from the median of the last
+    `outlier_window` raw values is replaced by that median before it is
+    smoothed (a Hampel filter), so a single spurious peak cannot drag the
+    result. A real step in the heart rate passes once it holds for half
+    the outlier window. Every update costs the same no matter how long
+    the session is; only the median and the Hampel filter keep their
+    values sorted.
+    """
+
+    def __init__(self, method=SMOOTH_MEAN, horizon=4, outlier_threshold=None,
+                 outlier_window=7, min_deviation=1.0):
+        if method not in SMOOTHING_METHODS:
+            raise ValueError("Unknown smoothing method: {0}".format(method))
+        if horizon < 1:
+            raise ValueError("horizon must be at least 1")
+        self.method = method
+        self.horizon = horizon
+        self.outlier_threshold = outlier_threshold
+        # deviations below this many BPM are never outliers, even when the
+        # recent values happen to be identical (MAD of 0)
+        self.min_deviation = min_deviation
+        self.outliers = 0
+        self._window = RollingWindow(horizon, ordered=(method == SMOOTH_MEDIAN))
+        self._raw = (RollingWindow(outlier_window, ordered=True)
+                     if outlier_threshold is not None else None)
+        self._alpha = 2.0 / (horizon + 1)
+        self._ema = None
+        self._count = 0
+        self.value = None
+
+    def __len__(self):
+        """
+        Number of values the current result is based on, at most `horizon`.
+        """
+        return min(self._count, self.horizon)
+
+    def update(self, bpm):
+        """
+        Add the BPM of one window and return the smoothed value.
+        """
+        bpm = float(bpm)
+        if self._raw is not None:
+            raw = self._raw
+            value = bpm
+            # need a few values before deviations mean anything
+            if len(raw) >= 3:
+                median = raw.median()
+                deviation = MAD_SCALE * raw.mad()
+                limit = self.outlier_threshold * max(deviation, self.min_deviation)
+                if abs(bpm - median) > limit:
+                    value = median
+                    self.outliers += 1
+            raw.append(bpm)
+            bpm = value
+
+        self._count += 1
+        if self.method == SMOOTH_EMA:
+            if self._ema is None:
+                self._ema = bpm
+            else:
+                self._ema += self._alpha * (bpm - self._ema)
+            self.value = self._ema
+        else:
+            self._window.append(bpm)
+            if self.method == SMOOTH_MEAN:
+                self.value = self._window.mean()
+            else:
+                self.value = self._window.median()
+        return self.value
+
+    def reset(self):
+        self._window.clear()
+        if self._raw is not None:
+            self._raw.clear()
+        self._ema = None
+        self._count = 0
+        self.value = None
+
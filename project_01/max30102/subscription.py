@@ -0,0 +1,200 @@
+# -*-coding:utf-8
+
+from collections import deque, namedtuple
+import asyncio
+import threading
+
+# one published result of the heart rate calculation
+#   timestamp: time.monotonic() of the FIFO drain that completed the window
+#   bpm:       averaged beats per minute (0 when no finger is detected)
+#   spo2:      SpO2 in percent, or None when it could not be calculated
+#   quality:   one of the QUALITY_* values below
+#   confidence: 0 - 1, how much of a full window and of the BPM average the
+#               value is based on; below 1 for early, provisional readings
+Reading = namedtuple('Reading', ['timestamp', 'bpm', 'spo2', 'quality', 'confidence'],
+                     defaults=(1.0,))
+
+QUALITY_NO_FINGER = 0
+QUALITY_BPM_ONLY = 1
+QUALITY_GOOD = 2
+
+# how a subscriber that reads slower than readings are published catches up
+# once more than `max_lag` readings behind, skip the oldest unread ones
+SLOW_DROP_OLDEST = 'drop_oldest'
+# always skip straight to the newest reading (e.g. for a display)
+SLOW_LATEST = 'latest'
+
+SLOW_POLICIES = (SLOW_DROP_OLDEST, SLOW_LATEST)
+
+# `async for` waits in an executor thread for at most this long at a time,
+# so a cancelled consumer never leaves a thread blocked (asyncio.run()
+# waits for the executor threads when it shuts down)
+ASYNC_POLL_TIME = 0.1
+
+
+class ReadingBroker(object):
+    """
+    Thread-safe publish / subscribe hub for Readings.
+
+    Published readings go into one bounded history shared by all
+    subscribers; each Subscription only keeps its own cursor into it, so
+    publishing costs the same no matter how many subscribers there are.
+    Callbacks are run on the publishing thread and must return quickly.
+    """
+
+    def __init__(self, history=64):
+        if history < 1:
+            raise ValueError("history must be at least 1")
+        self.history = history
+        self._readings = deque(maxlen=history)
+        # sequence number of the newest reading, 0 before the first publish
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._callbacks = []
+        self._closed = False
+        self.callback_errors = 0
+
+    def publish(self, reading):
+        with self._cond:
+            self._readings.append(reading)
+            self._seq += 1
+            callbacks = list(self._callbacks)
+            self._cond.notify_all()
+
+        for callback in callbacks:
+            try:
+                callback(reading)
+            except Exception:
+                # a broken consumer must not take down the publisher
+                self.callback_errors += 1
+
+    def latest(self):
+        """
+        Return the newest reading, or None if nothing was published yet.
+        """
+        with self._cond:
+            return self._readings[-1] if self._readings else None
+
+    def add_callback(self, callback):
+        """
+        Call `callback(reading)` for every reading published from now on.
+        """
+        with self._cond:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        with self._cond:
+            self._callbacks.remove(callback)
+
+    def subscribe(self, max_lag=None, policy=SLOW_DROP_OLDEST):
+        """
+        Return a Subscription that will see every reading published from
+        now on, subject to `policy` once it is more than `max_lag`
+        readings behind (default: the broker history length).
+        """
+        return Subscription(self, max_lag, policy)
+
+    def close(self):
+        """
+        Wake all waiting subscribers; iteration stops once they have read
+        the remaining readings.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+
+
+class Subscription(object):
+    """
+    An independent cursor into a ReadingBroker.
+
+    Use `get()` to wait for the next reading, or iterate over it, either
+    with a plain `for` loop or with `async for`.
+    """
+
+    def __init__(self, broker, max_lag=None, policy=SLOW_DROP_OLDEST):
+        if policy not in SLOW_POLICIES:
+            raise ValueError("Unknown slow subscriber policy: {0}".format(policy))
+        if max_lag is None or max_lag > broker.history:
+            max_lag = broker.history
+        if max_lag < 1:
+            raise ValueError("max_lag must be at least 1")
+        self._broker = broker
+        self.max_lag = max_lag
+        self.policy = policy
+        with broker._cond:
+            # sequence number of the last reading this subscriber has seen
+            self._cursor = broker._seq
+        self._closed = False
+        # number of readings skipped because this subscriber was too slow
+        self.missed = 0
+
+    def pending(self):
+        """
+        Number of readings published but not yet read.
+        """
+        return self._broker._seq - self._cursor
+
+    def _ready(self):
+        broker = self._broker
+        return broker._seq != self._cursor or broker._closed or self._closed
+
+    def _wait_ready(self, timeout):
+        """
+        Wait up to `timeout` seconds for get() to have something to
+        return, without consuming it.
+        """
+        with self._broker._cond:
+            return self._broker._cond.wait_for(self._ready, timeout)
+
+    def get(self, timeout=None):
+        """
+        Return the next unread reading, waiting up to `timeout` seconds
+        (forever if None). Returns None on timeout or once closed.
+        """
+        broker = self._broker
+        with broker._cond:
+            broker._cond.wait_for(self._ready, timeout)
+            behind = broker._seq - self._cursor
+            if behind == 0 or self._closed:
+                return None
+
+            keep = 1 if self.policy == SLOW_LATEST else self.max_lag
+            if behind > keep:
+                self.missed += behind - keep
+                behind = keep
+
+            self._cursor = broker._seq - behind + 1
+            return broker._readings[-behind]
+
+    def close(self):
+        with self._broker._cond:
+            self._closed = True
+            self._broker._cond.notify_all()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        reading = self.get()
+        if reading is None:
+            raise StopIteration
+        return reading
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        # only wait in the executor; the reading is taken on the event loop
+        # thread, so a cancelled wait never consumes one
+        while not await loop.run_in_executor(None, self._wait_ready, ASYNC_POLL_TIME):
+            pass
+        reading = self.get(timeout=0)
+        if reading is None:
+            raise StopAsyncIteration
+        return reading
@@ -0,0 +1,50 @@
+# -*-coding:utf-8
+
+from recorder import PPGRecorder
+import numpy as np
+
+
+def synthetic_ppg(seconds, bpm=72, sample_rate=25, noise=0.0, seed=0, finger=None,
+                  scale=1.0):
+    """
+    Generate a clean-ish PPG signal for benchmarks.
+
+    `bpm` is either a constant or a function of time in seconds (e.g. to
+    model a step change). `noise` is the standard deviation of white noise
+    added to both channels, in ADC counts. `finger` is an optional function
+    of time that returns False while no finger is on the sensor, which
+    leaves only a low ambient level. `scale` multiplies the finger signal
+    to model darker / lighter skin or more / less pressure; the values are
+    not clipped to the 18-bit ADC range (ReplaySensor does that). Returns
+    (t, red, ir) arrays.
+    """
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / float(sample_rate)
+    if callable(bpm):
+        rate = np.array([bpm(x) for x in t], dtype=float)
+    else:
+        rate = np.full(n, float(bpm))
+    # integrate the beat frequency so that rate changes stay continuous
+    phase = 2 * np.pi * np.cumsum(rate / 60.0) / sample_rate
+    pulse = np.sin(phase) + 0.3 * np.sin(2 * phase)
+
+    rng = np.random.RandomState(seed)
+    ir = scale * (100000 + 3000 * pulse) + rng.normal(0, noise, n)
+    red = scale * (90000 + 2000 * pulse) + rng.normal(0, noise, n)
+    if finger is not None:
+        off = np.array([not finger(x) for x in t], dtype=bool)
+        ir[off] = 2000 + rng.normal(0, noise, off.sum())
+        red[off] = 1500 + rng.normal(0, noise, off.sum())
+    return t, red.astype(np.int32), ir.astype(np.int32)
+
+
+def write_synthetic_recording(path, seconds, **kwargs):
+    """
+    Write a synthetic_ppg signal as a PPGRecorder file that replay.py can
+    play back. Keyword arguments go to synthetic_ppg.
+    """
+    t, red, ir = synthetic_ppg(seconds, **kwargs)
+    with PPGRecorder(path, kwargs.get('sample_rate', 25)) as recorder:
+        for i in range(len(t)):
+            recorder.write_block(t[i], red[i:i + 1], ir[i:i + 1])
+    return path
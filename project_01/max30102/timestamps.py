@@ -0,0 +1,57 @@
+# -*-coding:utf-8
+
+from collections import deque
+
+import numpy as np
+
+
+class SampleTimer(object):
+    """
+    Assigns a time to every sample of a FIFO drain and keeps a running
+    estimate of the true sample rate.
+
+    The rate is the number of samples drained over the last `span` seconds
+    divided by the time between those drains. Burst jitter averages out
+    over the span, while slow drift of the sensor clock is still tracked.
+    Within a drain the newest sample is given the drain time and the
+    others are spaced 1 / rate apart before it. They are squeezed in evenly
+    after the previous drain if that would overlap it.
+    """
+
+    def __init__(self, nominal_rate, span=30.0, min_span=2.0):
+        self.nominal_rate = float(nominal_rate)
+        self.rate = float(nominal_rate)
+        self.span = span
+        self.min_span = min_span
+        # (drain time, samples drained up to and including that drain)
+        self._history = deque()
+        self._total = 0
+        self._last_time = None
+
+    def stamp(self, drain_time, n):
+        """
+        Return a float64 array with the times of the `n` samples read by
+        the drain that finished at `drain_time`.
+        """
+        self._total += n
+        history = self._history
+        history.append((drain_time, self._total))
+        while len(history) > 2 and drain_time - history[1][0] >= self.span:
+            history.popleft()
+        elapsed = drain_time - history[0][0]
+        if elapsed >= self.min_span:
+            self.rate = (self._total - history[0][1]) / elapsed
+
+        times = drain_time - np.arange(n - 1, -1, -1, dtype=np.float64) / self.rate
+        if self._last_time is not None and times[0] <= self._last_time:
+            # spread the block evenly between the previous sample and now
+            step = (drain_time - self._last_time) / n
+            times = self._last_time + step * np.arange(1, n + 1, dtype=np.float64)
+        self._last_time = drain_time
+        return times
+
+    def reset(self):
+        self._history.clear()
+        self._total = 0
+        self._last_time = None
+        self.rate = self.nominal_rate
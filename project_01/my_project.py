@@ -44,101 +44,46 @@ Software API:
   get_voltage()
     - Returns the approximate voltage of the pin in volts
 
+  open_display(i2c=None)
+    - Returns the timer display behind a DisplayWriter.  i2c is a bus to
+      use instead of i2c bus 1, e.g. emulator.EmulatedBus().
+
+  timer_seconds(value)
+    - Returns the timer setting in seconds for a potentiometer value
+
+  countdown(display, seconds, tick=None, sleep=time.sleep)
+    - Counts down from seconds to 0 on the display, one second per step.
+      tick() is called once per step (e.g. to read the buttons).
+
+  show_done(display), clear_done(display)
+    - Blink "done" on the display / stop it and go back to the timer
+
 """
-import Adafruit_BBIO.ADC as ADC
 import os
-import time
-import Adafruit_BBIO.GPIO as GPIO
-import Adafruit_BBIO.PWM as PWM
 import threading
+import time
+
+try:
+    import Adafruit_BBIO.ADC as ADC
+    import Adafruit_BBIO.GPIO as GPIO
+    import Adafruit_BBIO.PWM as PWM
+    from potentiometer import Potentiometer
+    from button import Button
+    from buzzer import Buzzer
+except ImportError:
+    # lets the timer logic be run off-device (e.g. with the emulator)
+    ADC = GPIO = PWM = None
+    Potentiometer = Button = Buzzer = None
 
 
 # ------------------------------------------------------------------------
 # Functions / Classes
 # ------------------------------------------------------------------------
-from timer import HT16K33
-from potentiometer import Potentiometer
-from button import Button
-from buzzer import Buzzer
+from timer import HT16K33, HT16K33_BLINK_1HZ, HT16K33_BLINK_OFF
+from display_writer import DisplayWriter
 # from breathing import Breathing
 
 
-# ------------------------------------------------------------------------
-# Constants
-# ------------------------------------------------------------------------
-
-# See https://en.wikipedia.org/wiki/Seven-segment_display for reference 
-
-HEX_DIGITS                  = [0x3f, 0x06, 0x5b, 0x4f,     # 0, 1, 2, 3
-                              0x66, 0x6d, 0x7d, 0x07,     # 4, 5, 6, 7
-                              0x7f, 0x6f, 0x77, 0x7c,     # 8, 9, A, b
-                              0x39, 0x5e, 0x79, 0x71]     # C, d, E, F
-
-LETTERS                     = { "a" : 0x77, "A" : 0x77,    # "A"
-                                "b" : 0x7c, "B" : 0x7c,    # "b"
-                                "c" : 0x58, "C" : 0x39,    # "c", "C"
-                                "d" : 0x5e, "D" : 0x5e,    # "d"
-                                "e" : 0x79, "E" : 0x79,    # "E"
-                                "f" : 0x71, "F" : 0x71,    # "F"
-                                "g" : 0x6F, "G" : 0x6F,    # "g"
-                                "h" : 0x74, "H" : 0x76,    # "h", "H"
-                                "i" : 0x04, "I" : 0x30,    # "i", "I"
-                                "j" : 0x0e, "J" : 0x0e,    # "J"
-# Cannot be implemented         "k" : None, "K" : None,    
-                                "l" : 0x38, "L" : 0x38,    # "L"
-# Cannot be implemented         "m" : None, "M" : None,    
-                                "n" : 0x54, "N" : 0x54,    # "n"
-                                "o" : 0x5c, "O" : 0x3f,    # "o", "O"
-                                "p" : 0x73, "P" : 0x73,    # "P"
-                                "q" : 0x67, "Q" : 0x67,    # "q"
-                                "r" : 0x50, "R" : 0x50,    # "r"
-                                "s" : 0x6D, "S" : 0x6D,    # "S"
-                                "t" : 0x78, "T" : 0x78,    # "t"
-                                "u" : 0x1c, "U" : 0x3e,    # "u", "U"
-# Cannot be implemented         "v" : None, "V" : None,    
-# Cannot be implemented         "w" : None, "W" : None,    
-# Cannot be implemented         "x" : None, "X" : None,    
-                                "y" : 0x6e, "Y" : 0x6e,    # "y"
-# Cannot be implemented         "z" : None, "Z" : None,    
-                                " " : 0x00,                # " "
-                                "-" : 0x40,                # "-"
-                                "0" : 0x3f,                # "0"
-                                "1" : 0x06,                # "1"
-                                "2" : 0x5b,                # "2"
-                                "3" : 0x4f,                # "3"
-                                "4" : 0x66,                # "4"
-                                "5" : 0x6d,                # "5"
-                                "6" : 0x7d,                # "6"
-                                "7" : 0x07,                # "7"
-                                "8" : 0x7f,                # "8"
-                                "9" : 0x6f,                # "9"
-                                "?" : 0x53                 # "?"
-                              }                               
-
-CLEAR_DIGIT                 = 0x7F
-POINT_VALUE                 = 0x80
-
-DIGIT_ADDR                  = [0x00, 0x02, 0x06, 0x08]
-COLON_ADDR                  = 0x04
-
-HT16K33_BLINK_CMD           = 0x80
-HT16K33_BLINK_DISPLAYON     = 0x01
-HT16K33_BLINK_OFF           = 0x00
-HT16K33_BLINK_2HZ           = 0x02
-HT16K33_BLINK_1HZ           = 0x04
-HT16K33_BLINK_HALFHZ        = 0x06
-
-HT16K33_SYSTEM_SETUP        = 0x20
-HT16K33_OSCILLATOR          = 0x01
-
-HT16K33_BRIGHTNESS_CMD      = 0xE0
-HT16K33_BRIGHTNESS_HIGHEST  = 0x0F
-HT16K33_BRIGHTNESS_DARKEST  = 0x00
-
-# Maximum decimal value that can be displayed on 4 digit Hex Display
-HT16K33_MAX_VALUE           = 9999
-
-
 # ------------------------------------------------------------------------
 # Constants
 # ------------------------------------------------------------------------
@@ -150,8 +95,13 @@ MAX_VALUE     = 4095
 # Constants
 # ------------------------------------------------------------------------
 
-HIGH          = GPIO.HIGH
-LOW           = GPIO.LOW
+HIGH          = 1              # GPIO.HIGH
+LOW           = 0              # GPIO.LOW
+
+DISPLAY_BUS     = 1
+DISPLAY_ADDRESS = 0x70
+
+POT_PER_MINUTE  = 45           # Potentiometer steps per timer minute (0 --> 91 min)
 
 
 # ------------------------------------------------------------------------
@@ -166,7 +116,52 @@ step = 5       # Step size
 # min =  0        # dimmest value
 # max =  100      # brightest value
 
- 
+
+# ------------------------------------------------------------------------
+# Timer functions (no hardware besides the display)
+# ------------------------------------------------------------------------
+
+def open_display(i2c=None):
+    """Return the display behind a writer thread, so the loop never waits on the bus"""
+    return DisplayWriter(HT16K33(DISPLAY_BUS, DISPLAY_ADDRESS, i2c=i2c))
+
+# End def
+
+
+def timer_seconds(value):
+    """Return the timer setting in seconds for a potentiometer value"""
+    return int(value / POT_PER_MINUTE) * 60
+
+# End def
+
+
+def countdown(display, seconds, tick=None, sleep=time.sleep):
+    """Count down from seconds to 0, one second per step; returns 0"""
+    while seconds:
+        if tick is not None:
+            tick()
+        display.show_time(seconds) # show XX min: XX sec
+        sleep(1) # make into 1 second at the end
+        seconds -= 1
+    return seconds
+
+# End def
+
+
+def show_done(display):
+    """Blink "done"; written once, the display blinks by itself"""
+    display.alert("done", HT16K33_BLINK_1HZ)
+
+# End def
+
+
+def clear_done(display):
+    """Stop blinking "done" and go back to showing the timer"""
+    display.set_blink(HT16K33_BLINK_OFF)
+    display.clear()
+    display.set_colon(True)
+
+# End def
 
 
 # ------------------------------------------------------------------------
@@ -175,7 +170,7 @@ step = 5       # Step size
 
 if __name__ == '__main__':
 
-    display = HT16K33(1, 0x70)
+    display = open_display()
     display.set_colon(True)
     PWM.start(LED, 0)
     GPIO.setup(buzz_LED, GPIO.OUT)
@@ -229,14 +224,20 @@ if __name__ == '__main__':
         buzzer.play(880, 1.0, True)       # Play 440Hz for 1 second
         time.sleep(1.0)   
         buzzer.cleanup()
-        
-    def countdown(t):
-        mins, secs = divmod(t, 60) # split into min and sec
-        timer = (mins*100) + secs # show XX min: XX sec
-        display.update(timer) # display time
-        time.sleep(1) # make into 1 second at the end
-        t -= 1 
-        return t
+    
+    def set_brightness():
+        # get value for display brightness
+        value2 = pot2.get_value()
+        disp_bright = int(value2/256) # set to be within range of max brightness
+        display.set_brightness(disp_bright) # only written when it changes
+    
+    def tick():
+        # once per second of the countdown
+        global buzz_on
+        buzz_on = buzz_light(buzz_on)
+        set_brightness()
+        # if button1.is_pressed():
+        #     Breathing(state_start_time, state, 4, 7, 8)
         
     
     try:
@@ -251,54 +252,34 @@ if __name__ == '__main__':
             # Get potentiometer value
             value = pot1.get_value()
             
-            # get value for display brightness
-            value2 = pot2.get_value()
-            disp_bright = int(value2/256) # set to be within range of max brightness
-            display.setup(1, disp_bright) # set brightness
+            set_brightness()
             
             # before starting timer, get start time, push button2 to start it
             if not start_timer:
                 display.set_colon(True)
                 buzz_on = buzz_light(buzz_on)
                 if value > 0:
-                    set_timer = int(value / 45) # make value from 0 --> 91 min
-                    display.update(set_timer*100) # show amount of time
-                    # get value for display brightness
-                    value2 = pot2.get_value()
-                    disp_bright = int(value2/256) # set to be within range of max brightness
-                    display.setup(1, disp_bright) # set brightness
+                    display.show_time(timer_seconds(value)) # show amount of time
+                    set_brightness()
                     time.sleep(0.1)
                 if button2.is_pressed():
                     start_timer = not start_timer
                     print(start_timer)
                     time.sleep(0.1)
                     
-            t = int(value/45)*60  # number of seconds
+            t = timer_seconds(value)  # number of seconds
             
-            while t and start_timer: 
-                buzz_on = buzz_light(buzz_on)
-                mins, secs = divmod(t, 60) # split into min and sec
-                timer = (mins*100) + secs # show XX min: XX sec
-                display.update(timer) # display time
-                time.sleep(1) # make into 1 second at the end
-                t -= 1 
-                # set brightness for display
-                value2 = pot2.get_value()
-                disp_bright = int(value2/256) # set to be within range of max brightness
-                display.setup(1, disp_bright) # set brightness
-                # if button1.is_pressed():
-                #     Breathing(state_start_time, state, 4, 7, 8)
+            if start_timer:
+                t = countdown(display, t, tick)
+                show_done(display)
                 
             while t == 0 and start_timer: # once countdown goes to zero
                 buzz_on = buzz_light(buzz_on)
-                letters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ?"
-                display.text("done")
                 if buzz_on:
                     buzz()
                 time.sleep(0.1)
                 if button2.is_pressed():
-                    display.clear()
-                    display.set_colon(True)
+                    clear_done(display)
                     time.sleep(0.1)
                     start_timer = not start_timer
                     print(start_timer)
@@ -315,8 +296,11 @@ if __name__ == '__main__':
     PWM.stop(LED)
     PWM.cleanup()
     GPIO.cleanup()
+    display.set_blink(HT16K33_BLINK_OFF) # do not leave "done" blinking
     display.clear()
+    display.close()
+    stats = display.get_stats()
+    print("Display: {0}".format(stats))
+    print("Display bus writes per minute: {0:.1f}".format(stats['bus_writes_per_min']))
 
     print("Test Complete")
-
-
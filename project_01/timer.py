@@ -33,10 +33,28 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 --------------------------------------------------------------------------
 Software API:
 
-  HT16K33(bus, address=0x70)
+  HT16K33(bus, address=0x70, auto_flush=True, i2c=None)
     - Provide i2c bus that dispaly is on
     - Provide i2c address for the display
+    - The bus is opened once (smbus) and kept open until close()
+    - i2c is an already open bus to use instead, e.g. an
+      emulator.EmulatedBus to run without the hardware
+    - All functions below only change an in-memory copy of the display
+      RAM (the framebuffer).  With auto_flush=True every call ends with
+      a flush(); otherwise call flush() to show the changes.
     
+    setup(blink, brightness)
+      - Start the oscillator (only the first time) and set blink and
+        brightness.  Only settings that changed are written to the bus.
+
+    set_brightness(brightness)
+      - Set the brightness, 0 (darkest) to 15 (brightest).  Nothing is
+        written if the display already has that brightness.
+
+    set_blink(blink)
+      - Set the blink rate (HT16K33_BLINK_OFF / _2HZ / _1HZ / _HALFHZ).
+        Nothing is written if the display already blinks at that rate.
+
     clear()
       - Sets value of display to "0000"
     
@@ -49,10 +67,45 @@ Software API:
     update(value)
       - Update the value on the display.  Value must be between 0 and 9999.
 
+    show_time(seconds)
+      - Show seconds as MM:SS with the colon on.  Seconds must be between
+        0 and 5999 (99:59).
+
     text(value)
       - Update the value on the display with text.
-        The following characters are supported:
-            "abcdefghijlnopqrstuyABCDEFGHIJLNOPQRSTUY? -"
+        The following characters are supported (see font.py):
+            "abcdefghijlnopqrstuyABCDEFGHIJLNOPQRSTUY0123456789? -"
+
+    set_segments(segments, colon=False)
+      - Show up to 4 raw segment bytes (e.g. from font.render())
+
+    scroll(message, interval=0.3, repeat=False)
+      - Scroll a message of any length across the display from a
+        background thread.  Returns the Marquee that plays it; call its
+        stop() before writing to the display again.
+
+    alert(value, blink=HT16K33_BLINK_1HZ)
+      - Show text and let the HT16K33 blink it by itself; nothing more is
+        written until set_blink(HT16K33_BLINK_OFF)
+
+    pulse(low=0, high=15, period=2.0, rate=4.0, cycles=None)
+      - Ramp the brightness from low to high and back every period
+        seconds from a background thread.  At most rate brightness
+        writes per second, and only when the level changes.  Returns the
+        Pulse that plays it; its stop() puts the brightness back.
+
+    flush(frame=None)
+      - Send the changes in the framebuffer (or in frame, a snapshot of
+        it) to the display, either as one write per changed address or as
+        one block write over the changed range, whichever puts fewer bytes
+        on the bus
+    
+    get_bus_stats()
+      - Return a dictionary with the number of frames, bus writes and bus
+        bytes sent so far, and the average bytes per frame
+
+    close()
+      - Close the i2c bus
   
 --------------------------------------------------------------------------
 Background Information: 
@@ -69,69 +122,43 @@ Background Information:
         * https://github.com/adafruit/Adafruit_Python_LED_Backpack/blob/master/Adafruit_LED_Backpack/SevenSegment.py
         * https://github.com/adafruit/Adafruit_Python_LED_Backpack/blob/master/examples/sevensegment_test.py
 
-    * Letters Supported from:
+    * Letters Supported from (font.py):
         * https://en.wikichip.org/wiki/seven-segment_display/representing_letters
         
 """
-import os
+import numbers
+import threading
+import time
+from itertools import product
+
+# The font lives in font.py; HEX_DIGITS and LETTERS are still importable
+# from here
+from font import HEX_DIGITS, render, marquee_frames
+from font import LETTERS  # noqa: F401  (re-exported)
+
+try:
+    import smbus
+except ImportError:
+    # lets the module be imported (e.g. by the benchmark) off-device
+    smbus = None
 
 # ------------------------------------------------------------------------
 # Constants
 # ------------------------------------------------------------------------
 
-# See https://en.wikipedia.org/wiki/Seven-segment_display for reference 
-
-HEX_DIGITS                  = [0x3f, 0x06, 0x5b, 0x4f,     # 0, 1, 2, 3
-                               0x66, 0x6d, 0x7d, 0x07,     # 4, 5, 6, 7
-                               0x7f, 0x6f, 0x77, 0x7c,     # 8, 9, A, b
-                               0x39, 0x5e, 0x79, 0x71]     # C, d, E, F
-
-LETTERS                     = { "a" : 0x77, "A" : 0x77,    # "A"
-                                "b" : 0x7c, "B" : 0x7c,    # "b"
-                                "c" : 0x58, "C" : 0x39,    # "c", "C"
-                                "d" : 0x5e, "D" : 0x5e,    # "d"
-                                "e" : 0x79, "E" : 0x79,    # "E"
-                                "f" : 0x71, "F" : 0x71,    # "F"
-                                "g" : 0x6F, "G" : 0x6F,    # "g"
-                                "h" : 0x74, "H" : 0x76,    # "h", "H"
-                                "i" : 0x04, "I" : 0x30,    # "i", "I"
-                                "j" : 0x0e, "J" : 0x0e,    # "J"
-# Cannot be implemented         "k" : None, "K" : None,    
-                                "l" : 0x38, "L" : 0x38,    # "L"
-# Cannot be implemented         "m" : None, "M" : None,    
-                                "n" : 0x54, "N" : 0x54,    # "n"
-                                "o" : 0x5c, "O" : 0x3f,    # "o", "O"
-                                "p" : 0x73, "P" : 0x73,    # "P"
-                                "q" : 0x67, "Q" : 0x67,    # "q"
-                                "r" : 0x50, "R" : 0x50,    # "r"
-                                "s" : 0x6D, "S" : 0x6D,    # "S"
-                                "t" : 0x78, "T" : 0x78,    # "t"
-                                "u" : 0x1c, "U" : 0x3e,    # "u", "U"
-# Cannot be implemented         "v" : None, "V" : None,    
-# Cannot be implemented         "w" : None, "W" : None,    
-# Cannot be implemented         "x" : None, "X" : None,    
-                                "y" : 0x6e, "Y" : 0x6e,    # "y"
-# Cannot be implemented         "z" : None, "Z" : None,    
-                                " " : 0x00,                # " "
-                                "-" : 0x40,                # "-"
-                                "0" : 0x3f,                # "0"
-                                "1" : 0x06,                # "1"
-                                "2" : 0x5b,                # "2"
-                                "3" : 0x4f,                # "3"
-                                "4" : 0x66,                # "4"
-                                "5" : 0x6d,                # "5"
-                                "6" : 0x7d,                # "6"
-                                "7" : 0x07,                # "7"
-                                "8" : 0x7f,                # "8"
-                                "9" : 0x6f,                # "9"
-                                "?" : 0x53                 # "?"
-                              }                               
-
 CLEAR_DIGIT                 = 0x7F
 POINT_VALUE                 = 0x80
 
 DIGIT_ADDR                  = [0x00, 0x02, 0x06, 0x08]
 COLON_ADDR                  = 0x04
+COLON_VALUE                 = 0x02
+
+# Size of the display RAM in bytes
+HT16K33_RAM_SIZE            = 16
+
+# Bytes on the bus: address byte + command / register byte (+ data)
+I2C_COMMAND_BYTES           = 2
+I2C_REGISTER_BYTES          = 3
 
 HT16K33_BLINK_CMD           = 0x80
 HT16K33_BLINK_DISPLAYON     = 0x01
@@ -147,8 +174,31 @@ HT16K33_BRIGHTNESS_CMD      = 0xE0
 HT16K33_BRIGHTNESS_HIGHEST  = 0x0F
 HT16K33_BRIGHTNESS_DARKEST  = 0x00
 
+# Brightness pulse:  default period (seconds) and brightness updates per second
+PULSE_PERIOD                = 2.0
+PULSE_RATE                  = 4.0
+
 # Maximum decimal value that can be displayed on 4 digit Hex Display
 HT16K33_MAX_VALUE           = 9999
+# Maximum number of seconds that can be displayed as MM:SS (99:59)
+HT16K33_MAX_SECONDS         = (99 * 60) + 59
+
+# Segment tables, built once:  every value 0 - 9999 and every time 00:00 -
+# 99:59 as 5 bytes in display RAM order (digit 0, digit 1, colon, digit 2,
+# digit 3), so that entry n is table[5*n : 5*n + 5] and can be copied into
+# ram[0:10:2] in one slice
+SEGMENT_ENTRY_SIZE          = 5
+
+DECIMAL_SEGMENTS            = HEX_DIGITS[:10]
+
+VALUE_SEGMENTS              = bytes(byte
+                                    for d0, d1, d2, d3 in product(DECIMAL_SEGMENTS, repeat=4)
+                                    for byte in (d0, d1, 0x00, d2, d3))
+
+TIME_SEGMENTS               = bytes(byte
+                                    for d0, d1, d2, d3 in product(DECIMAL_SEGMENTS, DECIMAL_SEGMENTS,
+                                                                  DECIMAL_SEGMENTS[:6], DECIMAL_SEGMENTS)
+                                    for byte in (d0, d1, COLON_VALUE, d2, d3))
 
 
 # ------------------------------------------------------------------------
@@ -156,17 +206,42 @@ HT16K33_MAX_VALUE           = 9999
 # ------------------------------------------------------------------------
 class HT16K33():
     """ Class to manage a HT16K33 I2C display """
-    bus     = None
-    address = None
-    command = None
+    bus        = None
+    address    = None
+    i2c        = None
+    ram        = None
+    auto_flush = None
     
-    def __init__(self, bus, address=0x70, blink=HT16K33_BLINK_OFF, brightness=HT16K33_BRIGHTNESS_HIGHEST):
+    def __init__(self, bus, address=0x70, blink=HT16K33_BLINK_OFF, brightness=HT16K33_BRIGHTNESS_HIGHEST,
+                 auto_flush=True, i2c=None):
         """ Initialize class variables; Set up display; Set display to blank """
         
         # Initialize class variables
-        self.bus     = bus
-        self.address = address
-        self.command = "/usr/sbin/i2cset -y {0} {1}".format(bus, address)
+        self.bus        = bus
+        self.address    = address
+        self.auto_flush = auto_flush
+
+        # Framebuffer and what the display RAM holds (None = unknown)
+        self.ram        = bytearray(HT16K33_RAM_SIZE)
+        self.shown      = None
+
+        # Shadows of the display settings (None = unknown)
+        self.initialized = False
+        self.blink       = None
+        self.brightness  = None
+        
+        # Bus statistics
+        self.frames      = 0
+        self.frame_bytes = 0
+        self.bus_writes  = 0
+        self.bus_bytes   = 0
+
+        # Open the bus once instead of running i2cset for every write
+        if i2c is None:
+            if smbus is None:
+                raise ImportError("The smbus module is required to talk to the HT16K33")
+            i2c = smbus.SMBus(bus)
+        self.i2c     = i2c
 
         # Set up display        
         self.setup(blink, brightness)
@@ -179,16 +254,60 @@ class HT16K33():
     
     def setup(self, blink, brightness):
         """Initialize the display itself"""
-        # i2cset -y 1 0x70 0x21
-        os.system("{0} {1}".format(self.command, (HT16K33_SYSTEM_SETUP | HT16K33_OSCILLATOR)))
-        # i2cset -y 1 0x70 0x81
-        os.system("{0} {1}".format(self.command, (HT16K33_BLINK_CMD | blink | HT16K33_BLINK_DISPLAYON)))
-        # i2cset -y 1 0x70 0xEF
-        os.system("{0} {1}".format(self.command, (HT16K33_BRIGHTNESS_CMD | brightness)))
+        if not self.initialized:
+            self.init()
+        self.set_blink(blink)
+        self.set_brightness(brightness)
 
     # End def    
 
 
+    def init(self):
+        """Turn on the oscillator; needed once after power up"""
+        # i2cset -y 1 0x70 0x21
+        self._write_command(HT16K33_SYSTEM_SETUP | HT16K33_OSCILLATOR)
+        self.initialized = True
+
+    # End def
+
+
+    def set_blink(self, blink):
+        """Set the blink rate, if it changed"""
+        # The display on bit is always set (e.g. setup(1, ...) means no blink)
+        blink = blink & ~HT16K33_BLINK_DISPLAYON
+        if blink not in (HT16K33_BLINK_OFF, HT16K33_BLINK_2HZ, HT16K33_BLINK_1HZ, HT16K33_BLINK_HALFHZ):
+            raise ValueError("Blink must be one of the HT16K33_BLINK_* values")
+        
+        if blink != self.blink:
+            # i2cset -y 1 0x70 0x81
+            self._write_command(HT16K33_BLINK_CMD | blink | HT16K33_BLINK_DISPLAYON)
+            self.blink = blink
+
+    # End def
+
+
+    def set_brightness(self, brightness):
+        """Set the brightness, if it changed"""
+        if ((brightness < HT16K33_BRIGHTNESS_DARKEST) or (brightness > HT16K33_BRIGHTNESS_HIGHEST)):
+            raise ValueError("Brightness is not between 0 and 15")
+        
+        if brightness != self.brightness:
+            # i2cset -y 1 0x70 0xEF
+            self._write_command(HT16K33_BRIGHTNESS_CMD | brightness)
+            self.brightness = brightness
+
+    # End def
+
+
+    def _write_command(self, command):
+        """Send a single command byte"""
+        self.i2c.write_byte(self.address, command)
+        self.bus_writes += 1
+        self.bus_bytes  += I2C_COMMAND_BYTES
+
+    # End def
+
+
     def encode(self, data, double_point=False):
         """Encode data to TM1637 format.
         
@@ -216,14 +335,16 @@ class HT16K33():
 
     def set_digit(self, digit_number, data, double_point=False):
         """Update the given digit of the display."""
-        os.system("{0} {1} {2}".format(self.command, DIGIT_ADDR[digit_number], self.encode(data, double_point)))    
+        self.ram[DIGIT_ADDR[digit_number]] = self.encode(data, double_point)
+        self._changed()
 
     # End def
 
 
     def set_digit_raw(self, digit_number, data, double_point=False):
         """Update the given digit of the display using raw data value"""
-        os.system("{0} {1} {2}".format(self.command, DIGIT_ADDR[digit_number], data))    
+        self.ram[DIGIT_ADDR[digit_number]] = data
+        self._changed()
 
     # End def
 
@@ -231,28 +352,25 @@ class HT16K33():
     def set_colon(self, enable):
         """Set the colon on the display."""
         if enable:
-            os.system("{0} {1} {2}".format(self.command, COLON_ADDR, 0x02))
+            self.ram[COLON_ADDR] = COLON_VALUE
         else:
-            os.system("{0} {1} {2}".format(self.command, COLON_ADDR, 0x00))
+            self.ram[COLON_ADDR] = 0x00
+        self._changed()
 
     # End def        
 
 
     def blank(self):
         """Clear the display to read nothing"""
-        self.set_colon(False)
-
-        self.set_digit_raw(3, 0x00)
-        self.set_digit_raw(2, 0x00)
-        self.set_digit_raw(1, 0x00)
-        self.set_digit_raw(0, 0x00)
+        self.ram[:] = bytes(HT16K33_RAM_SIZE)
+        self._changed()
 
     # End def
 
 
     def clear(self):
         """Clear the display to read '0000'"""
-        self.set_colon(False)
+        self.ram[COLON_ADDR] = 0x00
         self.update(0)
 
     # End def
@@ -263,17 +381,37 @@ class HT16K33():
         
         This function will clear the display and then set the appropriate digits
         
-        :param value: Value must be between 0 and 9999.
+        :param value: Value must be an integer between 0 and 9999.
         
-        Will throw a ValueError if number is not between 0 and 9999.
+        Will throw a ValueError if number is not an integer between 0 and 9999.
         """
-        if ((value < 0) or (value > 9999)):
-            raise ValueError("Value is not between 0 and 9999")
+        if ((not isinstance(value, numbers.Integral)) or (value < 0) or (value > 9999)):
+            raise ValueError("Value is not an integer between 0 and 9999")
         
-        self.set_digit(3, (value % 10))
-        self.set_digit(2, (value // 10) % 10)
-        self.set_digit(1, (value // 100) % 10)
-        self.set_digit(0, (value // 1000) % 10)
+        # Copy the digits from the table, keeping the colon as it is
+        colon  = self.ram[COLON_ADDR]
+        offset = value * SEGMENT_ENTRY_SIZE
+        self.ram[0:10:2] = VALUE_SEGMENTS[offset:offset + SEGMENT_ENTRY_SIZE]
+        self.ram[COLON_ADDR] = colon
+        self._changed()
+
+    # End def
+    
+    
+    def show_time(self, seconds):
+        """Show a number of seconds as MM:SS, with the colon on.
+        
+        :param seconds: Seconds must be an integer between 0 and 5999 (99:59).
+        
+        Will throw a ValueError if seconds is not an integer between 0 and 5999.
+        """
+        if ((not isinstance(seconds, numbers.Integral)) or
+            (seconds < 0) or (seconds > HT16K33_MAX_SECONDS)):
+            raise ValueError("Seconds is not an integer between 0 and {0}".format(HT16K33_MAX_SECONDS))
+        
+        offset = seconds * SEGMENT_ENTRY_SIZE
+        self.ram[0:10:2] = TIME_SEGMENTS[offset:offset + SEGMENT_ENTRY_SIZE]
+        self._changed()
 
     # End def
     
@@ -288,16 +426,299 @@ class HT16K33():
         if ((len(value) < 1) or (len(value) > 4)):
             raise ValueError("Must have between 1 and 4 characters")        
         
-        # Clear the display
-        self.blank()
+        # Blank the display and set the correct characters in one frame
+        self.set_segments(render(value))
+
+    # End def
+
+
+    def set_segments(self, segments, colon=False):
+        """Show raw segment bytes, one per digit, and set the colon.
+        
+        :param segments: Between 0 and 4 bytes; missing digits are blank
+        """
+        if (len(segments) > 4):
+            raise ValueError("Must have at most 4 segment bytes")
+        
+        self.ram[:] = bytes(HT16K33_RAM_SIZE)
+        for i, segment in enumerate(segments):
+            self.ram[DIGIT_ADDR[i]] = segment
+        if colon:
+            self.ram[COLON_ADDR] = COLON_VALUE
+        self._changed()
+
+    # End def
+
+
+    def scroll(self, message, interval=0.3, repeat=False):
+        """Scroll a message across the display from a background thread.
+        
+        Returns the started Marquee.
+        """
+        marquee = Marquee(self, message, interval, repeat)
+        marquee.start()
+        return marquee
+
+    # End def
 
-        # Set the display to the correct characters        
-        for i, char in enumerate(value):
-            try:
-                char_value = LETTERS[char]
-                self.set_digit_raw(i, char_value)
-            except:
-                raise ValueError("Character {0} not supported".format(char))
+
+    def alert(self, value, blink=HT16K33_BLINK_1HZ):
+        """Show text and blink it in hardware (no further writes needed)"""
+        self.text(value)
+        self.set_blink(blink)
+
+    # End def
+
+
+    def pulse(self, low=HT16K33_BRIGHTNESS_DARKEST, high=HT16K33_BRIGHTNESS_HIGHEST,
+              period=PULSE_PERIOD, rate=PULSE_RATE, cycles=None):
+        """Pulse the brightness from a background thread.
+        
+        Returns the started Pulse.
+        """
+        pulse = Pulse(self, low, high, period, rate, cycles)
+        pulse.start()
+        return pulse
+
+    # End def
+
+
+    def _changed(self):
+        """Flush the framebuffer if auto_flush is set"""
+        if self.auto_flush:
+            self.flush()
+
+    # End def
+
+
+    def flush(self, frame=None):
+        """Send the changes in the framebuffer to the display.
+        
+        :param frame: Display RAM contents to send instead of the
+            framebuffer, e.g. a copy taken by another thread
+        
+        Changed addresses are either written one by one (3 bytes each) or
+        as one auto-increment block write from the first to the last
+        changed address (2 bytes + 1 per address), whichever is cheaper.
+        
+        Returns the number of bytes put on the bus.
+        """
+        ram   = self.ram if frame is None else frame
+        shown = self.shown
+        
+        if shown is None:
+            changed = list(range(HT16K33_RAM_SIZE))
+        else:
+            changed = [i for i in range(HT16K33_RAM_SIZE) if ram[i] != shown[i]]
+        
+        if not changed:
+            return 0
+        
+        first       = changed[0]
+        last        = changed[-1]
+        block_bytes = I2C_COMMAND_BYTES + (last - first + 1)
+        
+        if (I2C_REGISTER_BYTES * len(changed)) <= block_bytes:
+            for i in changed:
+                self.i2c.write_byte_data(self.address, i, ram[i])
+            self.bus_writes += len(changed)
+            sent = I2C_REGISTER_BYTES * len(changed)
+        else:
+            self.i2c.write_i2c_block_data(self.address, first, list(ram[first:last + 1]))
+            self.bus_writes += 1
+            sent = block_bytes
+        
+        self.shown        = bytearray(ram)
+        self.frames      += 1
+        self.frame_bytes += sent
+        self.bus_bytes   += sent
+        
+        return sent
+
+    # End def
+
+
+    def get_bus_stats(self):
+        """Return the bus statistics as a dictionary"""
+        return {
+            'frames'          : self.frames,
+            'bus_writes'      : self.bus_writes,
+            'bus_bytes'       : self.bus_bytes,
+            'bytes_per_frame' : (float(self.frame_bytes) / self.frames) if self.frames else 0.0,
+        }
+
+    # End def
+
+
+    def close(self):
+        """Close the i2c bus"""
+        self.i2c.close()
+
+    # End def
+
+# End class
+
+
+class Marquee():
+    """ Plays the precomputed frames of a scrolling message on a display """
+    display  = None
+    frames   = None
+    interval = None
+    repeat   = None
+    
+    def __init__(self, display, message, interval=0.3, repeat=False):
+        """ Render all frames up front (see font.marquee_frames()) """
+        self.display  = display
+        self.frames   = marquee_frames(message)
+        self.interval = interval
+        self.repeat   = repeat
+        self._stop    = threading.Event()
+        self._thread  = None
+
+    # End def
+
+
+    def start(self):
+        """Start playing the frames"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    # End def
+
+
+    def _run(self):
+        """Show one frame per interval, on a fixed schedule"""
+        next_frame = time.monotonic()
+        while True:
+            for frame in self.frames:
+                self.display.set_segments(frame)
+                next_frame += self.interval
+                if self._stop.wait(max(0.0, next_frame - time.monotonic())):
+                    return
+            if not self.repeat:
+                return
+
+    # End def
+
+
+    def is_running(self):
+        """Return True while frames are still being played"""
+        return (self._thread is not None) and self._thread.is_alive()
+
+    # End def
+
+
+    def wait(self, timeout=None):
+        """Wait for a non-repeating marquee to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # End def
+
+
+    def stop(self):
+        """Stop playing; the last frame stays on the display"""
+        self._stop.set()
+        self.wait()
+
+    # End def
+
+# End class
+
+
+
+class Pulse():
+    """ Ramps the brightness of a display up and down on a schedule """
+    display = None
+    low     = None
+    high    = None
+    period  = None
+    rate    = None
+    cycles  = None
+    
+    def __init__(self, display, low=HT16K33_BRIGHTNESS_DARKEST, high=HT16K33_BRIGHTNESS_HIGHEST,
+                 period=PULSE_PERIOD, rate=PULSE_RATE, cycles=None):
+        """ Precompute the brightness levels of one period.
+        
+        :param display: Anything with set_brightness() (e.g. an HT16K33 or
+            a DisplayWriter)
+        :param cycles:  Number of periods to play, None for no end
+        """
+        if ((low < HT16K33_BRIGHTNESS_DARKEST) or (high > HT16K33_BRIGHTNESS_HIGHEST) or (low > high)):
+            raise ValueError("Brightness range must be within 0 and 15")
+        if ((period <= 0) or (rate <= 0)):
+            raise ValueError("Period and rate must be positive")
+        
+        self.display  = display
+        self.low      = low
+        self.high     = high
+        self.period   = period
+        self.rate     = rate
+        self.cycles   = cycles
+        
+        # Triangle wave, one level per step:  low -> high -> low
+        steps         = max(2, int(round(period * rate)))
+        self.levels   = [low + int(round((high - low) * (1.0 - abs(1.0 - 2.0 * i / steps))))
+                         for i in range(steps)]
+        self.restore  = getattr(display, 'brightness', None)
+        self._stop    = threading.Event()
+        self._thread  = None
+
+    # End def
+
+
+    def start(self):
+        """Start pulsing"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    # End def
+
+
+    def _run(self):
+        """Set one level per step, on a fixed schedule"""
+        interval  = self.period / len(self.levels)
+        next_step = time.monotonic()
+        cycle     = 0
+        while (self.cycles is None) or (cycle < self.cycles):
+            for level in self.levels:
+                # Unchanged levels are not written (see set_brightness())
+                self.display.set_brightness(level)
+                next_step += interval
+                if self._stop.wait(max(0.0, next_step - time.monotonic())):
+                    return
+            cycle += 1
+
+    # End def
+
+
+    def is_running(self):
+        """Return True while the pulse is still playing"""
+        return (self._thread is not None) and self._thread.is_alive()
+
+    # End def
+
+
+    def wait(self, timeout=None):
+        """Wait for a pulse with a number of cycles to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # End def
+
+
+    def stop(self):
+        """Stop pulsing and put back the brightness from before the pulse"""
+        self._stop.set()
+        self.wait()
+        if self.restore is not None:
+            self.display.set_brightness(self.restore)
+
+    # End def
 
 # End class
 
@@ -307,8 +728,6 @@ class HT16K33():
 # ------------------------------------------------------------------------
 
 if __name__ == '__main__':
-    import time
-
     delay = 0.25
     
     print("Test Display:")
@@ -321,9 +740,7 @@ if __name__ == '__main__':
     def countdown(t): 
         
         while t: 
-            mins, secs = divmod(t, 60) 
-            timer = (mins*100) + secs
-            display.update(timer) 
+            display.show_time(t) 
             time.sleep(0.25) 
             t -= 1
       
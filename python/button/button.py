@@ -44,10 +44,16 @@ button is not pressed) and will be connected to power when the button is pressed
   To select the pull up configuration, active_low=True.  To select the pull down
 configuration, active_low=False.
 
+  With edge_detect=True the driver does not poll the pin.  The kernel reports
+every rising / falling edge (GPIO.add_event_detect()), the edge is time stamped
+as soon as it is reported and wait_for_press() sleeps until then.  Press times
+and durations come from the edge time stamps, so there is no sleep_time added
+to the latency and taps shorter than sleep_time are not missed.
+
 
 Software API:
 
-  Button(pin, sleep_time=0.1, active_low=True)
+  Button(pin, sleep_time=0.1, active_low=True, edge_detect=False, bounce_time=10)
     - Provide pin that the button monitors
     - The sleep_time is the time between calls to the callback functions
       while the button is waiting in either the pressed or unpressed state
@@ -57,10 +63,21 @@ Software API:
       input is "High"/"1" when the button is not pressed, and the 
       input is "Low" / "0" when the button is pressed).  If false, 
       the button has the opposite polarity.
+    - With edge_detect=True, wait for edges instead of polling the pin.
+      Edges within bounce_time (ms) of the previous one are ignored.  The
+      pressed / unpressed callbacks are still called every sleep_time;
+      without them the wait does not wake up until the button is used.
     
     wait_for_press()
       - Wait for the button to be pressed 
       - Function consumes time
+    
+    get_wakeups()
+      - Return how many times wait_for_press() woke up to check the button
+    
+    get_last_press_latency()
+      - Return the time from the press edge to the on press callback
+        (edge_detect=True only, else None)
         
     is_pressed()
       - Return a boolean value (i.e. True/False) on if button is pressed
@@ -70,7 +87,7 @@ Software API:
       - Return the duration the button was last pressed
 
     cleanup()
-      - Clean up HW
+      - Clean up HW (stops the edge detection)
       
     Callback Functions:
       These functions will be called at the various times during a button 
@@ -92,7 +109,9 @@ Software API:
       - get_on_release_callback_value()      
 
 """
+import threading
 import time
+from collections import deque
 
 import Adafruit_BBIO.GPIO as GPIO
 
@@ -103,6 +122,8 @@ import Adafruit_BBIO.GPIO as GPIO
 HIGH          = GPIO.HIGH
 LOW           = GPIO.LOW
 
+BOUNCE_TIME   = 10                # Edges ignored after an edge (ms)
+
 # ------------------------------------------------------------------------
 # Global variables
 # ------------------------------------------------------------------------
@@ -122,6 +143,11 @@ class Button():
     
     sleep_time                    = None
     press_duration                = None
+    
+    edge_detect                   = None
+    bounce_time                   = None
+    wakeups                       = None
+    press_latency                 = None
 
     pressed_callback              = None
     pressed_callback_value        = None
@@ -133,7 +159,8 @@ class Button():
     on_release_callback_value     = None
     
     
-    def __init__(self, pin=None, sleep_time=0.1, active_low=True):
+    def __init__(self, pin=None, sleep_time=0.1, active_low=True, edge_detect=False,
+                 bounce_time=BOUNCE_TIME):
         """ Initialize variables and set up the button """
         if (pin == None):
             raise ValueError("Pin not provided for Button()")
@@ -152,6 +179,14 @@ class Button():
         # Initialize Class Variables      
         self.sleep_time      = sleep_time
         self.press_duration  = 0.0        
+        self.edge_detect     = edge_detect
+        self.bounce_time     = bounce_time
+        self.wakeups         = 0
+        
+        # Edges reported by the kernel:  (time, level), oldest first
+        self._edges          = deque()
+        self._edge_lock      = threading.Condition()
+        self._level          = None
 
         # All callback functions and values set to None if not used        
         
@@ -165,6 +200,53 @@ class Button():
         """ Setup the hardware components. """
         # Initialize Button
         GPIO.setup(self.pin, GPIO.IN)
+        
+        if self.edge_detect:
+            self._level = GPIO.input(self.pin)
+            GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=self._on_edge,
+                                  bouncetime=self.bounce_time)
+
+    # End def
+
+
+    def _on_edge(self, channel):
+        """ Record an edge; called from the GPIO event thread as soon as
+           the kernel reports the edge.
+        """
+        edge_time = time.time()
+        level     = GPIO.input(self.pin)
+        
+        with self._edge_lock:
+            if level == self._level:
+                # The pin went to the other level and back before it could
+                # be read (e.g. a very short tap):  record both edges
+                self._edges.append((edge_time, HIGH if level == LOW else LOW))
+            self._edges.append((edge_time, level))
+            self._level = level
+            self._edge_lock.notify()
+
+    # End def
+
+
+    def _next_edge(self, value, timeout):
+        """ Wait for an edge to value.
+        
+           Arguments:  value   - Level to wait for
+                       timeout - Seconds to wait, None to wait until it happens
+           Returns:    Time of the edge, None on timeout
+        """
+        with self._edge_lock:
+            while True:
+                while self._edges:
+                    edge_time, level = self._edges.popleft()
+                    if level == value:
+                        return edge_time
+                
+                notified = self._edge_lock.wait(timeout)
+                self.wakeups += 1
+                
+                if not notified and not self._edges:
+                    return None
 
     # End def
 
@@ -192,6 +274,10 @@ class Button():
            Arguments:  None
            Returns:    None
         """
+        if self.edge_detect:
+            self._wait_for_press_edge()
+            return
+        
         button_press_time = None
         
         # Wait for button press
@@ -203,6 +289,7 @@ class Button():
                 self.unpressed_callback_value = self.unpressed_callback()
             
             time.sleep(self.sleep_time)
+            self.wakeups += 1
             
         # Record time
         button_press_time = time.time()
@@ -220,6 +307,7 @@ class Button():
                 self.pressed_callback_value = self.pressed_callback()
                 
             time.sleep(self.sleep_time)
+            self.wakeups += 1
         
         # Record the press duration
         self.press_duration = time.time() - button_press_time
@@ -230,6 +318,67 @@ class Button():
         
     # End def
 
+
+    def _wait_for_press_edge(self):
+        """ wait_for_press() for edge_detect=True:  sleep until the kernel
+           reports an edge, unless a callback has to run every sleep_time.
+        """
+        # Only edges from now on count, like the polled version.  Read the
+        # pin rather than trusting the last edge, which may have been
+        # dropped within the bounce time
+        with self._edge_lock:
+            self._edges.clear()
+            self._level = GPIO.input(self.pin)
+            pressed = (self._level == self.pressed_value)
+        
+        # Wait for button press
+        #   Execute the unpressed callback function based on the sleep time
+        #
+        if pressed:
+            button_press_time = time.time()
+        else:
+            timeout = None if self.unpressed_callback is None else self.sleep_time
+            while True:
+                if self.unpressed_callback is not None:
+                    self.unpressed_callback_value = self.unpressed_callback()
+                
+                button_press_time = self._next_edge(self.pressed_value, timeout)
+                if button_press_time is not None:
+                    break
+        
+        self.press_latency = time.time() - button_press_time
+        
+        # Executed the on press callback function
+        if self.on_press_callback is not None:
+            self.on_press_callback_value = self.on_press_callback()
+        
+        # Wait for button release
+        #   Execute the pressed callback function based on the sleep time;
+        #   also check the pin then, in case the release edge was dropped
+        #   within the bounce time
+        #
+        while True:
+            if self.pressed_callback is not None:
+                self.pressed_callback_value = self.pressed_callback()
+            
+            button_release_time = self._next_edge(self.unpressed_value, self.sleep_time)
+            if button_release_time is not None:
+                break
+            if GPIO.input(self.pin) == self.unpressed_value:
+                button_release_time = time.time()
+                with self._edge_lock:
+                    self._level = self.unpressed_value
+                break
+        
+        # Record the press duration
+        self.press_duration = button_release_time - button_press_time
+        
+        # Executed the on release callback function
+        if self.on_release_callback is not None:
+            self.on_release_callback_value = self.on_release_callback()
+        
+    # End def
+
     
     def get_last_press_duration(self):
         """ Return the last press duration """
@@ -238,10 +387,24 @@ class Button():
     # End def
     
     
+    def get_wakeups(self):
+        """ Return the number of times wait_for_press() woke up """
+        return self.wakeups
+    
+    # End def
+    
+    
+    def get_last_press_latency(self):
+        """ Return the time from the last press edge to the on press callback """
+        return self.press_latency
+    
+    # End def
+    
+    
     def cleanup(self):
         """ Clean up the button hardware. """
-        # Nothing to do for GPIO
-        pass
+        if self.edge_detect:
+            GPIO.remove_event_detect(self.pin)
     
     # End def
     